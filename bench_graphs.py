@@ -0,0 +1,301 @@
+# Course: CS261 - Data Structures
+# Author: Rex Fagin
+# Assignment: HW6
+# Description: Seeded benchmarks of the graph operations, with saved baselines
+
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from d_graph import DirectedGraph, SparseDirectedGraph, NumpyDirectedGraph, np
+from ud_graph import UndirectedGraph
+
+# vertex counts for each size, grids use the nearest square
+SIZES = {'small': 100, 'medium': 400, 'large': 1600}
+
+# a timing this many times the baseline counts as a regression
+TOLERANCE = 1.5
+
+# cases faster than this in both runs are too noisy to flag
+NOISE_FLOOR = 0.001
+
+# ------------------------------------------------------------------ #
+
+def random_edges(n, seed) -> []:
+    """
+    Return about 4n random (u, v, weight) edges over n vertices, no loops
+    """
+    rng = random.Random(seed)
+    edges = []
+    for _ in range(4 * n):
+        u, v = rng.randrange(n), rng.randrange(n)
+        if u != v:
+            edges.append((u, v, rng.randint(1, 20)))
+    return edges
+
+
+def scale_free_edges(n, seed, m=3) -> []:
+    """
+    Return (u, v, weight) edges grown by preferential attachment
+    Every new vertex links to m existing vertices picked by degree
+    """
+    rng = random.Random(seed)
+    edges = []
+
+    # each vertex appears once per edge end, so picks follow degree
+    ends = list(range(m))
+    for new in range(m, n):
+        targets = set()
+        while len(targets) < m:
+            targets.add(rng.choice(ends))
+        for old in sorted(targets):
+            # pick a direction at random so directed graphs get cycles
+            u, v = (new, old) if rng.random() < 0.5 else (old, new)
+            edges.append((u, v, rng.randint(1, 20)))
+            ends.extend((new, old))
+    return edges
+
+
+def grid_edges(n, seed) -> []:
+    """
+    Return (u, v, weight) edges of a square grid with about n vertices
+    Edges point right and down, so the directed grid is acyclic
+    """
+    rng = random.Random(seed)
+    side = max(2, round(n ** 0.5))
+    edges = []
+    for row in range(side):
+        for col in range(side):
+            vertex = row * side + col
+            if col + 1 < side:
+                edges.append((vertex, vertex + 1, rng.randint(1, 20)))
+            if row + 1 < side:
+                edges.append((vertex, vertex + side, rng.randint(1, 20)))
+    return edges
+
+
+def chain_edges(n, seed) -> []:
+    """
+    Return the n - 1 (u, v, weight) edges of a path 0 -> 1 -> ... -> n - 1
+    """
+    rng = random.Random(seed)
+    return [(i, i + 1, rng.randint(1, 20)) for i in range(n - 1)]
+
+
+GENERATORS = {'random': random_edges, 'scale_free': scale_free_edges,
+              'grid': grid_edges, 'chain': chain_edges}
+
+
+def undirected(edges) -> []:
+    """Return the edges as (name, name) pairs for an UndirectedGraph"""
+    return [(f'v{u}', f'v{v}') for u, v, _ in edges]
+
+# ------------------------------------------------------------------ #
+
+def fresh(graph):
+    """Drop cached query results so the next call does the real work"""
+    graph.query_cache.clear()
+    return graph
+
+
+def toggle_edges(graph, edges) -> None:
+    """Add each edge again after removing it, ends with the same graph"""
+    for u, v, w in edges:
+        graph.remove_edge(u, v)
+    for u, v, w in edges:
+        graph.add_edge(u, v, w)
+
+
+def toggle_undirected(graph, edges) -> None:
+    """Add each edge again after removing it, ends with the same graph"""
+    for u, v in edges:
+        graph.remove_edge(u, v)
+    for u, v in edges:
+        graph.add_edge(u, v)
+
+
+def directed_operations(cls):
+    """
+    Return (name, setup, run) for each DirectedGraph operation
+    setup(edges) is not timed, run(state) is
+    """
+    def build(edges):
+        return fresh(cls(edges))
+
+    return [
+        ('construct', lambda edges: edges, cls),
+        ('add_remove_edge', lambda edges: (build(edges), edges[:200]),
+         lambda state: toggle_edges(*state)),
+        ('get_edges', build, lambda g: g.get_edges()),
+        ('dfs', build, lambda g: g.dfs(0)),
+        ('bfs', build, lambda g: g.bfs(0)),
+        ('has_cycle', build, lambda g: g.has_cycle()),
+        ('dijkstra', build, lambda g: g.dijkstra(0)),
+    ]
+
+
+def undirected_operations():
+    """
+    Return (name, setup, run) for each UndirectedGraph operation
+    setup(edges) is not timed, run(state) is
+    """
+    def build(edges):
+        return fresh(UndirectedGraph(undirected(edges)))
+
+    return [
+        ('construct', undirected, UndirectedGraph),
+        ('add_remove_edge', lambda edges: (build(edges), undirected(edges[:200])),
+         lambda state: toggle_undirected(*state)),
+        ('get_edges', build, lambda g: g.get_edges()),
+        ('dfs', build, lambda g: g.dfs('v0')),
+        ('bfs', build, lambda g: g.bfs('v0')),
+        ('has_cycle', build, lambda g: g.has_cycle()),
+        ('count_connected_components', build,
+         lambda g: g.count_connected_components()),
+    ]
+
+
+def graph_classes() -> {}:
+    """Return the operations of every graph class that can run here"""
+    classes = {'DirectedGraph': directed_operations(DirectedGraph),
+               'SparseDirectedGraph': directed_operations(SparseDirectedGraph)}
+
+    # the numpy backend is optional
+    if np is not None:
+        classes['NumpyDirectedGraph'] = directed_operations(NumpyDirectedGraph)
+
+    classes['UndirectedGraph'] = undirected_operations()
+    return classes
+
+# ------------------------------------------------------------------ #
+
+def measure(setup, run, edges, repeat) -> {}:
+    """
+    Return the best time of repeat runs and the peak memory of one run
+    Every run gets a fresh state from setup
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        state = setup(edges)
+
+        # like timeit, keep garbage collection out of the timed run
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            run(state)
+            best = min(best, time.perf_counter() - start)
+        finally:
+            gc.enable()
+
+    # trace memory on a separate run, tracing slows the timed ones down
+    state = setup(edges)
+    tracemalloc.start()
+    try:
+        run(state)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {'seconds': best, 'peak_bytes': peak}
+
+
+def run_suite(sizes=('small', 'medium'), repeat=5, seed=261, select=None) -> {}:
+    """
+    Time every operation of every graph class on every generated graph
+    Return {'class/generator/size/operation': measurement}
+    select, if given, keeps only keys that contain it
+    """
+    results = {}
+    for size in sizes:
+        for gen_name, generator in GENERATORS.items():
+            edges = generator(SIZES[size], seed)
+            for cls_name, operations in graph_classes().items():
+                for op_name, setup, run in operations:
+                    key = f'{cls_name}/{gen_name}/{size}/{op_name}'
+                    if select is not None and select not in key:
+                        continue
+                    results[key] = measure(setup, run, edges, repeat)
+    return results
+
+
+def save_baseline(results, path, seed) -> None:
+    """
+    Save results as JSON with the settings needed to reproduce them
+    """
+    with open(path, 'w') as file:
+        json.dump({'python': platform.python_version(),
+                   'machine': platform.machine(),
+                   'seed': seed,
+                   'results': results}, file, indent=1, sort_keys=True)
+
+
+def compare(results, path, tolerance=TOLERANCE) -> []:
+    """
+    Compare results with a saved baseline, return rows of
+    (key, baseline seconds, seconds, ratio, regressed)
+    Keys missing from either side are skipped, cases under the noise
+    floor are never flagged
+    """
+    with open(path) as file:
+        baseline = json.load(file)['results']
+
+    rows = []
+    for key in sorted(results.keys() & baseline.keys()):
+        old, new = baseline[key]['seconds'], results[key]['seconds']
+        ratio = new / old if old > 0 else float('inf')
+        regressed = ratio > tolerance and new > NOISE_FLOOR
+        rows.append((key, old, new, ratio, regressed))
+    return rows
+
+
+def report(results, rows=None, file=sys.stdout) -> None:
+    """
+    Print a table of results, with the baseline comparison if given
+    """
+    if rows is None:
+        print(f'{"case":<58} {"ms":>10} {"peak KiB":>10}', file=file)
+        for key, result in results.items():
+            print(f'{key:<58} {result["seconds"] * 1000:>10.3f} '
+                  f'{result["peak_bytes"] / 1024:>10.1f}', file=file)
+        return
+
+    print(f'{"case":<58} {"base ms":>10} {"ms":>10} {"ratio":>7}', file=file)
+    for key, old, new, ratio, regressed in rows:
+        flag = '  REGRESSION' if regressed else ''
+        print(f'{key:<58} {old * 1000:>10.3f} {new * 1000:>10.3f} '
+              f'{ratio:>7.2f}{flag}', file=file)
+
+
+def main(argv=None) -> int:
+    """
+    Command line entry, return 1 if any case regressed against the baseline
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the graph operations')
+    parser.add_argument('--sizes', default='small,medium',
+                        help=f'comma separated, from {", ".join(SIZES)}')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=261)
+    parser.add_argument('--select', help='only run cases whose key contains this')
+    parser.add_argument('--save', metavar='PATH', help='save results as a baseline')
+    parser.add_argument('--compare', metavar='PATH', help='compare with a baseline')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.sizes.split(','), args.repeat, args.seed, args.select)
+    rows = compare(results, args.compare, args.tolerance) if args.compare else None
+    report(results, rows)
+    if args.save:
+        save_baseline(results, args.save, args.seed)
+
+    return int(any(row[4] for row in rows or ()))
+
+
+
+if __name__ == '__main__':
+    sys.exit(main())
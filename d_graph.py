@@ -3,8 +3,25 @@
 # Assignment: HW6
 # Description: Methods for directed graphs
 
+import csv
 import heapq
+import mmap
+import operator
+import struct
+from array import array
+from bisect import bisect_left, insort
 from collections import deque
+from numbers import Integral
+
+import graph_stats
+from graph_cache import QueryCache, cached_query
+from graph_lock import RWLock, reads, writes
+from graph_stats import instrumented
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 class DirectedGraph:
     """
@@ -18,22 +35,47 @@ class DirectedGraph:
     def __init__(self, start_edges=None):
         """
         Store graph info as adjacency matrix
-        DO NOT CHANGE THIS METHOD IN ANY WAY
         """
+        # readers-writer lock, set by enable_locking
+        self.lock = None
+
         self.v_count = 0
-        self.adj_matrix = []
+        self.init_storage()
+
+        # ascending in-edge and out-edge indexes, kept by update_edge
+        # rows in in_dirty/out_dirty were appended to in bulk and are sorted on use
+        self.in_edges = []
+        self.out_edges = []
+        self.in_dirty = set()
+        self.out_dirty = set()
+
+        # bumped on every change, cached results are tied to a version
+        self.version = 0
+        self.query_cache = QueryCache()
+        self.apsp = None
+        self.landmarks = None
+
+        # topological order, built by the first query that needs it and
+        # then kept up to date by add_edge while the graph stays acyclic
+        self.topo_order = []
+        self.topo_index = []
+        self.topo_valid = False
+        self.topo_cyclic_version = None
+
+        # vertices add_edge may still search before one rebuild is cheaper
+        self.topo_budget = 0
 
         # populate graph with initial vertices and edges (if provided)
-        # before using, implement add_vertex() and add_edge() methods
+        # storage is allocated once, then edges are added in one pass
         if start_edges is not None:
+            start_edges = list(start_edges)
             v_count = 0
             for u, v, _ in start_edges:
                 v_count = max(v_count, u, v)
-            for _ in range(v_count + 1):
-                self.add_vertex()
-            for u, v, weight in start_edges:
-                self.add_edge(u, v, weight)
+            self.add_vertices(v_count + 1)
+            self.add_edges_bulk(start_edges)
 
+    @reads
     def __str__(self):
         """
         Return content of the graph in human-readable form
@@ -53,25 +95,150 @@ class DirectedGraph:
 
     # ------------------------------------------------------------------ #
 
+    def init_storage(self) -> None:
+        """
+        Create the empty edge storage, overridden by other backends
+        """
+        self.adj_matrix = []
+
+    def enable_locking(self):
+        """
+        Guard every query and change with a readers-writer lock, return self
+        Call before sharing the graph between threads, then any number of
+        queries run together while each change waits for them and runs alone
+        iter_* generators and the single edge accessors are not guarded
+        """
+        if self.lock is None:
+            self.lock = RWLock()
+        return self
+
+    def enable_cache(self, maxsize=128):
+        """
+        Keep up to maxsize query results for the current version, return self
+        A maxsize of 0 turns caching off; caching is on with 128 by default
+        Each hit returns a copy of the cached list, O(V) but far cheaper than the query
+        """
+        self.query_cache.resize(maxsize)
+        return self
+
+    @classmethod
+    def from_edges(cls, edges):
+        """
+        Build a graph from an iterable of (src, dst, weight) edges
+        Vertex count is one more than the largest vertex name
+        """
+
+        # read the edges once, sizing the graph on the way
+        # edges with non integer ends are skipped by add_edges_bulk
+        edges = list(edges)
+        v_count = 0
+        for src, dst, _ in edges:
+            try:
+                v_count = max(v_count, operator.index(src) + 1, operator.index(dst) + 1)
+            except TypeError:
+                pass
+
+        # allocate storage once, then add every edge
+        graph = cls()
+        graph.add_vertices(v_count)
+        graph.add_edges_bulk(edges)
+        return graph
+
     def add_vertex(self) -> int:
         """
         Adds a vertex to the graph
         """
+        return self.add_vertices(1)
+
+    @writes
+    def add_vertices(self, count: int) -> int:
+        """
+        Adds count vertices to the graph, return the new vertex count
+        """
+        self.grow_storage(self.v_count + count)
 
-        # add a new row
-        self.adj_matrix.append([])
-        # build columns
-        for col in self.adj_matrix:
-            # make sure each row has cols == v_count
-            while len(col) <= self.v_count:
-                col.append(0)
+        # new vertices have no in or out edges yet
+        self.in_edges.extend([] for _ in range(count))
+        self.out_edges.extend([] for _ in range(count))
 
-        # increment v_count, return current count
-        self.v_count += 1
+        # new vertices have no edges, so they can go last in the order
+        if self.topo_valid:
+            self.topo_order.extend(range(self.v_count, self.v_count + count))
+            self.topo_index.extend(range(self.v_count, self.v_count + count))
+
+        # update v_count, return current count
+        self.v_count += count
+        self.version += 1
         return self.v_count
 
+    def grow_storage(self, new_count: int) -> None:
+        """
+        Make room for new_count vertices, overridden by other backends
+        """
+        count = new_count - self.v_count
+
+        # widen every existing row once
+        padding = [0] * count
+        for row in self.adj_matrix:
+            row.extend(padding)
 
+        # add the new rows at full width
+        for _ in range(count):
+            self.adj_matrix.append([0] * new_count)
 
+    def prepare_weights(self, typecode) -> None:
+        """
+        Get storage ready for weights of an array typecode, 'q' or 'd'
+        Lists hold any number, overridden by typed backends
+        """
+        pass
+
+    def fill_storage(self, offsets, targets, weights) -> None:
+        """
+        Write CSR rows into empty storage a row at a time, overridden by other backends
+        """
+        for src in range(self.v_count):
+            row = self.adj_matrix[src]
+            start, end = offsets[src], offsets[src + 1]
+            for dst, weight in zip(targets[start:end], weights[start:end]):
+                row[dst] = weight
+
+    @writes
+    def add_edges_bulk(self, edges) -> int:
+        """
+        Adds every valid (src, dst, weight) edge in one pass
+        Invalid edges are skipped like in add_edge, later duplicates win
+        Return the number of edges written
+        """
+        v_count = self.v_count
+        in_dirty, out_dirty = self.in_dirty, self.out_dirty
+        added = 0
+
+        for src, dst, weight in edges:
+            # skip non integer ends instead of truncating them
+            try:
+                src, dst = operator.index(src), operator.index(dst)
+            except TypeError:
+                continue
+
+            # skip loops, vertices outside the graph and non positive weights
+            if src == dst or not 0 <= src < v_count or not 0 <= dst < v_count:
+                continue
+            if weight < 1:
+                continue
+
+            # append to the edge index rows now, sort them once on first use
+            in_dirty.add(dst)
+            out_dirty.add(src)
+            self.update_edge(src, dst, weight)
+            added += 1
+
+        # the topological order is rebuilt once, on the next query
+        self.topo_valid = False
+        self.version += 1
+        return added
+
+    @writes
     def add_edge(self, src: int, dst: int, weight=1) -> None:
         """
         Adds an edge to the graph
@@ -92,11 +259,17 @@ class DirectedGraph:
         if weight < 1:
             return None
 
-        self.adj_matrix[src][dst] = weight
+        self.update_edge(src, dst, weight)
+        self.version += 1
+
+        # keep the topological order up to date while the graph is acyclic
+        if self.topo_valid:
+            self.topo_insert(src, dst)
 
 
 
 
+    @writes
     def remove_edge(self, src: int, dst: int) -> None:
         """
         Remove an edge from the graph
@@ -110,11 +283,13 @@ class DirectedGraph:
         if dst < 0 or dst >= self.v_count:
             return None
 
-        self.adj_matrix[src][dst] = 0
+        self.update_edge(src, dst, 0)
+        self.version += 1
 
 
 
 
+    @reads
     def get_vertices(self) -> []:
         """
         Return the vertices of the graph
@@ -125,6 +300,7 @@ class DirectedGraph:
             vertices.append(vertex)
         return vertices
 
+    @reads
     def get_edges(self) -> []:
         """
         Return a list of the edges in the graph
@@ -152,13 +328,69 @@ class DirectedGraph:
         # return edges
         return edges
 
+    def iter_edges(self):
+        """
+        Yield (src, dst, weight) for every edge, row by row
+        """
+        for src in range(self.v_count):
+            for dst in self.iter_neighbors(src):
+                yield src, dst, self.get_edge(src, dst)
+
+    def iter_neighbors(self, vertex):
+        """
+        Yield the adjacents of a vertex in ascending order
+        Do not change the graph while iterating
+        """
+        yield from self.sorted_adjacents(vertex)
+
     def get_edge(self, row, col):
         """Takes a row and col and return the weight of the cooresponding edge"""
 
         # return edge at row/col
         return self.adj_matrix[row][col]
 
+    def set_edge(self, row, col, weight) -> None:
+        """Store the weight of the edge at row/col, a weight of 0 removes it"""
+
+        # write edge at row/col
+        self.adj_matrix[row][col] = weight
 
+    def update_edge(self, src, dst, weight) -> None:
+        """Write an edge through set_edge and keep the edge indexes up to date"""
+
+        # compare old and new existence of the edge
+        existed = self.get_edge(src, dst) != 0
+        self.set_edge(src, dst, weight)
+        if weight != 0 and not existed:
+            # keep both index rows ascending, unless they are sorted later
+            if dst in self.in_dirty:
+                self.in_edges[dst].append(src)
+            else:
+                insort(self.in_edges[dst], src)
+            if src in self.out_dirty:
+                self.out_edges[src].append(dst)
+            else:
+                insort(self.out_edges[src], dst)
+        elif weight == 0 and existed:
+            row = self.in_edges[dst]
+            if dst in self.in_dirty:
+                row.remove(src)
+            else:
+                del row[bisect_left(row, src)]
+            row = self.out_edges[src]
+            if src in self.out_dirty:
+                row.remove(dst)
+            else:
+                del row[bisect_left(row, dst)]
+
+
+    def has_vertex(self, vertex) -> bool:
+        """Return True if vertex is in the graph, checked in constant time"""
+
+        # vertices are the integers 0 to v_count - 1, NumPy integers included
+        return isinstance(vertex, Integral) and 0 <= vertex < self.v_count
+
+    @reads
     def is_valid_path(self, path: []) -> bool:
         """
         Return True if sequence is a valid path in the graph. Otherwise return False
@@ -169,14 +401,14 @@ class DirectedGraph:
 
         # if path has only one element, check if vertex is in graph
         if len(path) < 2:
-            if path[0] not in self.get_vertices():
+            if not self.has_vertex(path[0]):
                 return False
             return True
 
         # iterate through path
         for i in range(0, len(path) - 1, 1):
-            # check if vertex exists
-            if path[i] not in self.get_vertices():
+            # check if both vertices exist
+            if not self.has_vertex(path[i]) or not self.has_vertex(path[i+1]):
                 return False
             # check if edge exists
             if self.get_edge(path[i], path[i+1]) == 0:
@@ -215,225 +447,1579 @@ class DirectedGraph:
         # return sorted array
         return arr
 
+    @reads
     def get_adjacents(self, vertex):
         """Find all adjacent edges to a vertex, return as a list"""
 
-        # initialize empty list
-        adjacents = []
+        # copy the out-edge index, no row scan needed
+        return list(self.sorted_adjacents(vertex))
 
-        count = 0
-        # append count for nonzero edges
-        for edge in self.adj_matrix[vertex]:
-            if edge != 0:
-                adjacents.append(count)
-            count += 1
+    def sorted_adjacents(self, vertex):
+        """Return the adjacents of a vertex in ascending order, do not modify the result"""
 
-        # return list
-        return adjacents
+        # rows filled in bulk are sorted once, on first use
+        # the sorted copy replaces the row, so other readers never see it half sorted
+        if vertex in self.out_dirty:
+            self.out_edges[vertex] = sorted(self.out_edges[vertex])
+            self.out_dirty.discard(vertex)
 
-    def dfs_traverse(self, vertex, visited, v_end):
-        """depth first traversal of list of vertices"""
+        return self.out_edges[vertex]
 
-        # # add vertex to list
-        visited.append(vertex)
+    def sorted_predecessors(self, vertex):
+        """Return the predecessors of a vertex in ascending order, do not modify the result"""
 
-        # if a valid end vertex is present, check for end condition
-        if v_end is not None:
-            if vertex == v_end:
-                # if end has been reached, return
-                return
+        # same lazy sort as sorted_adjacents, for rows filled in bulk
+        if vertex in self.in_dirty:
+            self.in_edges[vertex] = sorted(self.in_edges[vertex])
+            self.in_dirty.discard(vertex)
+
+        return self.in_edges[vertex]
 
-        # get adjacent vertices to vertex
-        adjacents = self.get_adjacents(vertex)
+    def iter_dfs(self, v_start, v_end=None):
+        """
+        Yield vertices in DFS order, one at a time, using an explicit stack
+        Vertices are picked in alphabetical order, stops after v_end
+        """
 
-        # sort vertex edges by ascending lexicographical order
-        self.shell_sort(adjacents)
+        # check if starting vertex is in the graph
+        if not self.has_vertex(v_start):
+            return
 
-        # iterate through adjacents
-        for adjacent in adjacents:
-            # if adjacent is not visited and not in v_end
-            if adjacent not in visited and v_end not in visited:
-                # make recursive call
-                self.dfs_traverse(adjacent, visited,v_end)
+        # check if end is valid
+        if not self.has_vertex(v_end):
+            v_end = None
 
+        # flag start as seen, one seen flag per vertex
+        seen = bytearray(self.v_count)
+        seen[v_start] = True
+        yield v_start
+
+        # if the start is the end, there is nothing left to visit
+        if v_start == v_end:
+            return
+
+        # each stack entry holds the remaining adjacents of a vertex
+        sorted_adjacents = graph_stats.expand(self.sorted_adjacents)
+        stack = [iter(sorted_adjacents(v_start))]
+
+        while stack:
+            # resume the deepest vertex at its next unseen adjacent
+            for adjacent in stack[-1]:
+                if not seen[adjacent]:
+                    seen[adjacent] = True
+                    yield adjacent
+
+                    # if end has been reached, stop
+                    if adjacent == v_end:
+                        return
+
+                    # descend into adjacent before its siblings
+                    stack.append(iter(sorted_adjacents(adjacent)))
+                    break
+            else:
+                # all adjacents done, backtrack
+                stack.pop()
+
+    @reads
+    @instrumented
+    @cached_query
     def dfs(self, v_start, v_end=None) -> []:
         """
         Return list of vertices visited during DFS search
         Vertices are picked in alphabetical order
         """
+        return list(self.iter_dfs(v_start, v_end))
 
-        vertices = self.get_vertices()
+    def iter_bfs(self, v_start, v_end=None):
+        """
+        Yield vertices in BFS order, one at a time
+        Vertices are picked in alphabetical order, stops after v_end
+        """
 
         # check if starting vertex is in the graph
-        if v_start not in vertices:
-            return []
+        if not self.has_vertex(v_start):
+            return
 
         # check if end is valid
-        if v_end not in vertices:
+        if not self.has_vertex(v_end):
             v_end = None
 
-        #  create empty list
-        visited = []
+        # one seen flag per vertex
+        seen = bytearray(self.v_count)
+        sorted_adjacents = graph_stats.expand(self.sorted_adjacents)
 
-        self.dfs_traverse(v_start, visited, v_end)
+        # add v_start to deque
+        vertex_deque = deque([v_start])
+        seen[v_start] = True
 
-        return visited
+        # if deque has vertices, pop a vertex
+        while vertex_deque:
+            # take the first element out of the queue
+            vertex = vertex_deque.popleft()
 
+            # vertices are only queued once, so each pop is a new visit
+            yield vertex
+
+            # if end has been reached, stop
+            if vertex == v_end:
+                return
+
+            # iterate through each edge in ascending order
+            for adjacent in sorted_adjacents(vertex):
+                # if an adjacent vertex has not been seen
+                if not seen[adjacent]:
+                    # add vertex to queue
+                    seen[adjacent] = True
+                    vertex_deque.append(adjacent)
+
+    @reads
+    @instrumented
+    @cached_query
     def bfs(self, v_start, v_end=None) -> []:
         """
         Return list of vertices visited during BFS search
         Vertices are picked in alphabetical order
         """
+        return list(self.iter_bfs(v_start, v_end))
 
-        vertices = self.get_vertices()
+    @reads
+    @instrumented
+    def bfs_levels(self, sources, max_depth=None) -> tuple:
+        """
+        Level synchronous BFS from one or more source vertices
+        Return (levels, parents) as array('i'), -1 where a vertex is unreached
+        Sources have level 0 and parent -1, stops after max_depth levels
+        """
 
-        # check if starting vertex is in the graph
-        if v_start not in vertices:
-            return []
+        # accept a single source as well as an iterable of sources
+        if isinstance(sources, Integral):
+            sources = [sources]
+
+        levels = array('i', [-1]) * self.v_count
+        parents = array('i', [-1]) * self.v_count
+        seen = bytearray(self.v_count)
+
+        # the first frontier is every valid source, once
+        frontier = array('i')
+        for src in sources:
+            if self.has_vertex(src) and not seen[src]:
+                seen[src] = True
+                levels[src] = 0
+                frontier.append(src)
+
+        sorted_adjacents = graph_stats.expand(self.sorted_adjacents)
+        depth = 0
+        while frontier and (max_depth is None or depth < max_depth):
+            depth += 1
+
+            # expand the whole frontier, in order, into the next level
+            next_frontier = array('i')
+            for vertex in frontier:
+                for adjacent in sorted_adjacents(vertex):
+                    if not seen[adjacent]:
+                        seen[adjacent] = True
+                        levels[adjacent] = depth
+                        parents[adjacent] = vertex
+                        next_frontier.append(adjacent)
+            frontier = next_frontier
+
+        return levels, parents
+
+    def cycle_traverse(self, vertex, state):
+        """
+        Helper traversal method for has_cycle, using an explicit stack
+        state is 0 for new, 1 for on the current path and 2 for finished
+        """
 
-        # check if end is valid
-        if v_end not in vertices:
-            v_end = None
+        # put vertex on the current path
+        state[vertex] = 1
+        sorted_adjacents = graph_stats.expand(self.sorted_adjacents)
+        stack = [(vertex, iter(sorted_adjacents(vertex)))]
 
-        #  create empty list
-        visited = []
+        while stack:
+            current, adjacents = stack[-1]
 
-        # initialize empty deque
-        vertex_deque = deque()
+            # iterate through each remaining edge
+            for adjacent in adjacents:
+                # an edge back into the current path closes a cycle
+                if state[adjacent] == 1:
+                    return True
 
-        # add v_start to deque
-        vertex_deque.appendleft(v_start)
+                # if an adjacent vertex has not been visited, descend
+                if state[adjacent] == 0:
+                    state[adjacent] = 1
+                    stack.append((adjacent, iter(sorted_adjacents(adjacent))))
+                    break
+            else:
+                # vertex is finished, take it off the current path
+                state[current] = 2
+                stack.pop()
 
-        # if deque has vertices, pop a vertex
-        while vertex_deque != deque([]):
-            # take the first element out of the queue
-            vertex = vertex_deque.pop()
+        return False
 
-            # add vertex to visited if its not a duplicate
-            if vertex not in visited:
-                visited.append(vertex)
+    @reads
+    @instrumented
+    @cached_query
+    def has_cycle(self):
+        """
+        Return True if graph contains a cycle, False otherwise
+        """
 
-            # check if vertex is end
-            if v_end is not None:
-                if vertex == v_end:
-                    # if end has been reached, return
-                    return visited
+        # a maintained topological order proves there is no cycle
+        if self.topo_valid:
+            return False
 
-            # get adjacent vertices to vertex
-            adjacents = self.get_adjacents(vertex)
+        # one state flag per vertex, all start as new
+        state = bytearray(self.v_count)
 
-            # sort vertex edges by ascending lexicographical order
-            self.shell_sort(adjacents)
+        # walk from every vertex that has not been visited
+        for vertex in range(self.v_count):
+            if state[vertex] == 0:
+                if self.cycle_traverse(vertex, state):
+                    return True
 
-            # iterate through each edge
-            for adjacent in adjacents:
-                # if an adjacent vertex has not been visited
-                if adjacent not in visited:
-                    # add vertex to queue
-                    vertex_deque.appendleft(adjacent)
+        return False
 
-        # return results
-        return visited
+    @reads
+    def get_predecessors(self, vertex) -> []:
+        """Find all vertices with an edge to vertex, return as a list"""
 
-    def cycle_traverse(self, vertex, visited, stack):
-        """Helper traversal method for has_cycle"""
+        # copy the ascending in-edge row, O(in-degree)
+        return list(self.sorted_predecessors(vertex))
 
-        # add vertex to list
-        visited[vertex] = True
-        stack[vertex] = True
+    def in_degree(self, vertex) -> int:
+        """Return the number of edges into vertex"""
+        return len(self.in_edges[vertex])
 
-        # get adjacent vertices to vertex
-        adjacents = self.get_adjacents(vertex)
+    def out_degree(self, vertex) -> int:
+        """Return the number of edges out of vertex"""
+        return len(self.out_edges[vertex])
 
-        # sort vertex edges by ascending lexicographical order
-        self.shell_sort(adjacents)
+    @reads
+    @instrumented
+    def topological_sort(self) -> []:
+        """
+        Return the vertices in topological order using Kahn's algorithm
+        Return None if the graph has a cycle
+        """
 
-        # iterate through each edge
-        for adjacent in adjacents:
+        # copy the in-degree of every vertex from the in-edge index
+        in_degree = [len(parents) for parents in self.in_edges]
 
-            # if an adjacent vertex has not been visited
-            if visited[adjacent] == False:
-                if self.cycle_traverse(adjacent,visited,stack) == True:
-                    return True
+        # start with every vertex that has no incoming edges
+        vertex_deque = deque(v for v in range(self.v_count) if in_degree[v] == 0)
+        order = []
 
-            # if adjacent is true in stack, return True
-            elif stack[adjacent] == True:
-                return True
+        # remove vertices one by one, releasing their adjacents
+        while vertex_deque:
+            vertex = vertex_deque.popleft()
+            order.append(vertex)
+            for adjacent in self.get_adjacents(vertex):
+                in_degree[adjacent] -= 1
+                if in_degree[adjacent] == 0:
+                    vertex_deque.append(adjacent)
 
-        stack[vertex] = False
-        return False
+        # vertices left over are on a cycle
+        if len(order) < self.v_count:
+            return None
+        return order
+
+    def rebuild_topo_order(self) -> None:
+        """Recompute the topological order from scratch, or note the graph is cyclic"""
+
+        # a cyclic graph stays cyclic until the next change
+        if self.topo_cyclic_version == self.version:
+            return
+
+        order = self.topological_sort()
+        if order is None:
+            self.topo_cyclic_version = self.version
+            return
+
+        # store the order and each vertex's position in it
+        # both are built first, readers may be using the old ones
+        topo_index = [0] * self.v_count
+        for position, vertex in enumerate(order):
+            topo_index[vertex] = position
+        self.topo_order = order
+        self.topo_index = topo_index
+        self.topo_valid = True
+
+        # repairs may cost a few rebuilds before giving up, a search
+        # step is cheaper than a rebuild step
+        self.topo_budget = 4 * (self.v_count + sum(map(len, self.out_edges)))
+
+    def topo_insert(self, src, dst) -> None:
+        """
+        Repair the topological order after adding src -> dst (Pearce-Kelly)
+        Only vertices placed between dst and src in the order are touched,
+        once repairs since the last rebuild searched 4 (V + E) vertices the
+        order is left for a rebuild on the next query
+        """
+        index = self.topo_index
+        lower, upper = index[dst], index[src]
+
+        # the order already agrees with the new edge
+        if upper < lower:
+            return
+
+        # vertices reachable from dst that are placed no later than src
+        budget = self.topo_budget
+        forward, seen, stack = [], {dst}, [dst]
+        while stack:
+            vertex = stack.pop()
+            forward.append(vertex)
+
+            # repairs that cost more than a rebuild stop here
+            budget -= 1
+            if budget < 0:
+                self.topo_valid = False
+                return
 
-    def has_cycle(self):
+            for adjacent in self.sorted_adjacents(vertex):
+                # reaching src again means the new edge closed a cycle
+                if adjacent == src:
+                    self.topo_valid = False
+                    self.topo_cyclic_version = self.version
+                    return
+                if adjacent not in seen and index[adjacent] < upper:
+                    seen.add(adjacent)
+                    stack.append(adjacent)
+
+        # vertices that reach src and are placed no earlier than dst
+        backward, seen, stack = [], {src}, [src]
+        while stack:
+            vertex = stack.pop()
+            backward.append(vertex)
+            budget -= 1
+            if budget < 0:
+                self.topo_valid = False
+                return
+            for parent in self.sorted_predecessors(vertex):
+                if parent not in seen and index[parent] > lower:
+                    seen.add(parent)
+                    stack.append(parent)
+
+        self.topo_budget = budget
+
+        # move everything reaching src ahead of everything dst reaches,
+        # reusing the same positions in the order
+        forward.sort(key=index.__getitem__)
+        backward.sort(key=index.__getitem__)
+        moved = backward + forward
+        positions = sorted(index[vertex] for vertex in moved)
+        for vertex, position in zip(moved, positions):
+            index[vertex] = position
+            self.topo_order[position] = vertex
+
+    @reads
+    def topological_order(self) -> []:
         """
-        Return True if graph contains a cycle, False otherwise
+        Return the vertices in a topological order, or None if the graph has a cycle
+        From the first call on, add_edge keeps the order up to date
         """
+        if not self.topo_valid:
+            self.rebuild_topo_order()
+        if not self.topo_valid:
+            return None
+        return list(self.topo_order)
 
-        # initialize empty dicts
-        visited = {}
-        stack = {}
+    @reads
+    def would_create_cycle(self, src: int, dst: int) -> bool:
+        """
+        Return True if the graph would contain a cycle after adding src -> dst
+        """
 
-        # populate with vertices
-        vertices = self.get_vertices()
-        stack = self.get_vertices()
+        # edges add_edge would reject never create a cycle
+        if src == dst or not self.has_vertex(src) or not self.has_vertex(dst):
+            return False
 
-        # set all values to False
-        for vertex in vertices:
-            visited[vertex] = False
-            stack[vertex] = False
+        # a graph that already has a cycle keeps it
+        if not self.topo_valid:
+            self.rebuild_topo_order()
+        if not self.topo_valid:
+            return True
 
-        # Make recursive calls for vertecies that have not been visited
-        for vertex in vertices:
-            if visited[vertex] == False:
-                if (self.cycle_traverse(vertex, visited, stack)) == True:
+        # an edge that agrees with the order can't close a cycle
+        index = self.topo_index
+        upper = index[src]
+        if upper < index[dst]:
+            return False
+
+        # otherwise look for src among what dst reaches, up to src's position
+        seen, stack = {dst}, [dst]
+        while stack:
+            for adjacent in self.sorted_adjacents(stack.pop()):
+                if adjacent == src:
                     return True
-
+                if adjacent not in seen and index[adjacent] < upper:
+                    seen.add(adjacent)
+                    stack.append(adjacent)
         return False
 
+    @writes
+    def add_edge_if_acyclic(self, src: int, dst: int, weight=1) -> bool:
+        """
+        Adds an edge only if it keeps the graph acyclic, return True if added
+        """
+
+        # reject edges add_edge would ignore and edges closing a cycle
+        if src == dst or not self.has_vertex(src) or not self.has_vertex(dst):
+            return False
+        if weight < 1 or self.would_create_cycle(src, dst):
+            return False
+
+        self.add_edge(src, dst, weight)
+        return True
+
+    @reads
+    def dag_paths(self, src: int, longest=False) -> tuple:
+        """
+        Single source shortest or longest paths of an acyclic graph in O(V+E)
+        Return (distances, previous), or None if the graph has a cycle
+        Unreached vertices are at infinity (shortest) or -infinity (longest)
+        """
+        order = self.topological_order()
+        if order is None:
+            return None
+
+        # initialize distances and no predecessors
+        unreached = float('-inf') if longest else float('inf')
+        distances = [unreached] * self.v_count
+        previous = [None] * self.v_count
+        if not self.has_vertex(src):
+            return distances, previous
+        distances[src] = 0
+
+        # relax edges in topological order, starting at src
+        for vertex in order[self.topo_index[src]:]:
+            if distances[vertex] == unreached:
+                continue
+            for adjacent in self.get_adjacents(vertex):
+                new_distance = distances[vertex] + self.get_edge(vertex, adjacent)
+                if (new_distance > distances[adjacent] if longest
+                        else new_distance < distances[adjacent]):
+                    distances[adjacent] = new_distance
+                    previous[adjacent] = vertex
+
+        return distances, previous
+
+    def dag_shortest_paths(self, src: int) -> []:
+        """
+        Return shortest distances from src like dijkstra, for acyclic graphs only
+        Return None if the graph has a cycle
+        """
+        result = self.dag_paths(src)
+        return None if result is None else result[0]
+
+    def dag_longest_paths(self, src: int) -> []:
+        """
+        Return longest distances from src, for acyclic graphs only
+        Return None if the graph has a cycle
+        """
+        result = self.dag_paths(src, longest=True)
+        return None if result is None else result[0]
+
+    @reads
+    def critical_path(self) -> tuple:
+        """
+        Return (path, length) of the heaviest path anywhere in an acyclic graph
+        Return None if the graph has a cycle
+        """
+        order = self.topological_order()
+        if order is None:
+            return None
+        if not order:
+            return [], 0
+
+        # every vertex can start a path of length 0
+        lengths = [0] * self.v_count
+        previous = [None] * self.v_count
+
+        # extend the best path into each vertex along its edges
+        for vertex in order:
+            for adjacent in self.get_adjacents(vertex):
+                new_length = lengths[vertex] + self.get_edge(vertex, adjacent)
+                if new_length > lengths[adjacent]:
+                    lengths[adjacent] = new_length
+                    previous[adjacent] = vertex
+
+        # the path ends at the vertex with the longest path into it
+        end = max(range(self.v_count), key=lengths.__getitem__)
+        return self.build_path(previous, end), lengths[end]
+
+    @reads
+    @instrumented
+    def strongly_connected_components(self):
+        """
+        Return an array('i') holding the component id of every vertex
+        Components are found with an iterative Tarjan walk in O(V+E) and
+        numbered in topological order of the condensation
+        """
+        n = self.v_count
+        index = array('i', [-1]) * n
+        low = array('i', [0]) * n
+        components = array('i', [-1]) * n
+        on_stack = bytearray(n)
+        stack = []
+        counter = 0
+        count = 0
+
+        for root in range(n):
+            if index[root] != -1:
+                continue
+
+            # open the root, each work entry holds a vertex and its edges
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = True
+            work = [(root, iter(self.get_adjacents(root)))]
+
+            while work:
+                vertex, adjacents = work[-1]
+                for adjacent in adjacents:
+                    # descend into a new vertex
+                    if index[adjacent] == -1:
+                        index[adjacent] = low[adjacent] = counter
+                        counter += 1
+                        stack.append(adjacent)
+                        on_stack[adjacent] = True
+                        work.append((adjacent, iter(self.get_adjacents(adjacent))))
+                        break
+
+                    # an edge back into the open stack lowers the link
+                    if on_stack[adjacent]:
+                        low[vertex] = min(low[vertex], index[adjacent])
+                else:
+                    # vertex is done, pass its link up to its parent
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[vertex])
+
+                    # a vertex that links to itself closes a component
+                    if low[vertex] == index[vertex]:
+                        while True:
+                            member = stack.pop()
+                            on_stack[member] = False
+                            components[member] = count
+                            if member == vertex:
+                                break
+                        count += 1
+
+        # tarjan closes components in reverse topological order
+        for vertex in range(n):
+            components[vertex] = count - 1 - components[vertex]
+        return components
+
+    @reads
+    def condensation(self) -> tuple:
+        """
+        Return (graph, components): the acyclic graph of strongly connected
+        components and the component id of every vertex
+        An edge between two components keeps the lowest weight joining them
+        """
+        components = self.strongly_connected_components()
+
+        # keep the lightest edge between each pair of components
+        weights = {}
+        for src in range(self.v_count):
+            for dst in self.get_adjacents(src):
+                key = (components[src], components[dst])
+                if key[0] != key[1]:
+                    weight = self.get_edge(src, dst)
+                    if key not in weights or weight < weights[key]:
+                        weights[key] = weight
+
+        # build the new graph with one vertex per component
+        graph = type(self)()
+        graph.add_vertices(max(components) + 1 if components else 0)
+        graph.add_edges_bulk((a, b, w) for (a, b), w in weights.items())
+        return graph, components
+
+    @reads
+    def dijkstra_search(self, sources, dst=None, reverse=False) -> tuple:
+        """
+        Heap based Dijkstra from one or more source vertices
+        Return (distances, previous), stop early once dst is settled
+        With reverse, follow edges backward to get distances to the sources
+        """
+
+        # accept a single source as well as an iterable of sources
+        if isinstance(sources, Integral):
+            sources = [sources]
+
+        # initialize distances to infinity and no predecessors
+        distances = [float('inf')] * self.v_count
+        previous = [None] * self.v_count
+        settled = [False] * self.v_count
+
+        # seed the heap with every valid source at distance 0
+        heap = []
+        for src in sources:
+            if 0 <= src < self.v_count and distances[src] != 0:
+                distances[src] = 0
+                heap.append((0, src))
+        heapq.heapify(heap)
+
+        # plain functions unless instrumentation is on
+        heappush, heappop = graph_stats.heap_ops()
+        adjacents_of = graph_stats.expand(
+            self.sorted_predecessors if reverse else self.sorted_adjacents)
+
+        # pop the closest unsettled vertex until the heap is empty
+        while heap:
+            distance, vertex = heappop(heap)
+
+            # skip stale heap entries for already settled vertices
+            if settled[vertex]:
+                continue
+            settled[vertex] = True
+
+            # in single target mode, dst is final once it is settled
+            if vertex == dst:
+                break
+
+            # relax every outgoing (or incoming, in reverse) edge of the vertex
+            for adjacent in adjacents_of(vertex):
+                if settled[adjacent]:
+                    continue
+                if reverse:
+                    new_distance = distance + self.get_edge(adjacent, vertex)
+                else:
+                    new_distance = distance + self.get_edge(vertex, adjacent)
+                if new_distance < distances[adjacent]:
+                    distances[adjacent] = new_distance
+                    previous[adjacent] = vertex
+                    heappush(heap, (new_distance, adjacent))
+
+        # return distances and predecessor map
+        return distances, previous
+
+    def build_path(self, previous, dst) -> []:
+        """Follow a predecessor map back from dst, return the path in order"""
+
+        # walk predecessors back to the source
+        path = []
+        while dst is not None:
+            path.append(dst)
+            dst = previous[dst]
+
+        # reverse into source to destination order
+        path.reverse()
+        return path
+
+    @reads
+    @instrumented
+    @cached_query
     def dijkstra(self, src: int) -> []:
         """
         Return a list of vertices with shortest possible path from the source
         """
 
-        # create list of distances for each vertex, initialize to infinity
-        distances = self.get_vertices()
-        for dist in distances:
-            if distances[dist] ==  distances[src]:
-                # set src distance as 0
-                distances[dist] = 0
-            else:
-                distances[dist] = float("inf")
-        # create a set for visited
-        visited = set()
-
-        # iterate as long as source is updated
-        while src != -1:
-            # set src to -1, min_distance to infinity
-            src, min_distance = -1, float('inf')
-            # for vertex in vertices
-            for v in range(self.v_count):
-                # if a vertex dist < min_distance and not visited
-                if distances[v] < min_distance and v not in visited:
-                    # set src to vertex, min_distance to vertex
-                    src, min_distance = v, distances[v]
-
-            # if there are no shorter unvisited vertecies than inf, return distances
-            if src == -1:
-                return distances
-
-            # add current vertex to set
-            visited.add(src)
-            # iterate through all dsts in vertices
-            for dist in range(self.v_count):
-                # if dst hasn't been visited and the edge exists
-                if dist not in visited and self.adj_matrix[src][dist] > 0:
-                    # check if dst value is an edge to source and if src to dist is lower
-                    if distances[dist] > distances[src] + self.adj_matrix[src][dist]:
-                        # if so, set new quicker path to that vertex's distance
-                        distances[dist] = distances[src] + self.adj_matrix[src][dist]
-
-        # return list of distances
+        # run the full search, keep only the distances
+        distances, _ = self.dijkstra_search(src)
         return distances
 
+    @reads
+    @instrumented
+    def shortest_path(self, src: int, dst: int) -> tuple:
+        """
+        Return (path, distance) of the shortest path from src to dst
+        Path is empty and distance is infinity if dst can't be reached
+        """
+
+        # check if both vertices are in the graph
+        if not 0 <= src < self.v_count or not 0 <= dst < self.v_count:
+            return [], float('inf')
+
+        # search only until dst is settled
+        distances, previous = self.dijkstra_search(src, dst)
+
+        # if dst was never reached, there is no path
+        if distances[dst] == float('inf'):
+            return [], distances[dst]
+
+        return self.build_path(previous, dst), distances[dst]
+
+    def bfs_level(self, frontier, own, other, neighbors) -> tuple:
+        """
+        Helper for bidirectional_bfs, expand one whole level of a frontier
+        Return (next frontier, meeting vertex or None)
+        """
+        next_frontier = []
+        for vertex in frontier:
+            for adjacent in neighbors(vertex):
+                if adjacent in own:
+                    continue
+                own[adjacent] = vertex
+
+                # the other search already reached this vertex
+                if adjacent in other:
+                    return next_frontier, adjacent
+                next_frontier.append(adjacent)
+        return next_frontier, None
+
+    @reads
+    @instrumented
+    def bidirectional_bfs(self, v_start, v_end) -> []:
+        """
+        Return a path from v_start to v_end with the fewest edges, searching
+        forward from v_start and backward from v_end until the two meet
+        Return an empty list if v_end can't be reached
+        """
+
+        # check if both vertices are in the graph
+        if not self.has_vertex(v_start) or not self.has_vertex(v_end):
+            return []
+        if v_start == v_end:
+            return [v_start]
+
+        # each side maps the vertices it reached to the vertex it came from
+        parents, children = {v_start: None}, {v_end: None}
+        forward, backward = [v_start], [v_end]
+
+        while forward and backward:
+            # grow the smaller frontier by one level
+            if len(forward) <= len(backward):
+                forward, meet = self.bfs_level(
+                    forward, parents, children, self.sorted_adjacents)
+            else:
+                backward, meet = self.bfs_level(
+                    backward, children, parents, self.sorted_predecessors)
+
+            if meet is not None:
+                # join the two halves at the meeting vertex
+                path = self.build_path(parents, meet)
+                vertex = children[meet]
+                while vertex is not None:
+                    path.append(vertex)
+                    vertex = children[vertex]
+                return path
+
+        return []
+
+    @reads
+    @instrumented
+    def bidirectional_dijkstra(self, src: int, dst: int) -> tuple:
+        """
+        Return (path, distance) of the shortest path from src to dst, running
+        Dijkstra forward from src and backward from dst until they meet
+        Path is empty and distance is infinity if dst can't be reached
+        """
+        inf = float('inf')
+
+        # check if both vertices are in the graph
+        if not self.has_vertex(src) or not self.has_vertex(dst):
+            return [], inf
+        if src == dst:
+            return [src], 0
+
+        # index 0 is the forward search, index 1 the backward search
+        distances = ({src: 0}, {dst: 0})
+        previous = ({src: None}, {dst: None})
+        settled = (set(), set())
+        heaps = ([(0, src)], [(0, dst)])
+        neighbors = (graph_stats.expand(self.sorted_adjacents),
+                     graph_stats.expand(self.sorted_predecessors))
+        heappush, heappop = graph_stats.heap_ops()
+        best, meet = inf, None
+
+        while heaps[0] and heaps[1]:
+            # no path through unsettled vertices can beat the best one found
+            if heaps[0][0][0] + heaps[1][0][0] >= best:
+                break
+
+            # advance the side with the closer frontier
+            side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+            other = 1 - side
+            distance, vertex = heappop(heaps[side])
+            if vertex in settled[side]:
+                continue
+            settled[side].add(vertex)
+
+            for adjacent in neighbors[side](vertex):
+                if side == 0:
+                    weight = self.get_edge(vertex, adjacent)
+                else:
+                    weight = self.get_edge(adjacent, vertex)
+                new_distance = distance + weight
+                if new_distance < distances[side].get(adjacent, inf):
+                    distances[side][adjacent] = new_distance
+                    previous[side][adjacent] = vertex
+                    heappush(heaps[side], (new_distance, adjacent))
+
+                # a vertex reached from both sides completes a path
+                if adjacent in distances[other]:
+                    total = distances[side][adjacent] + distances[other][adjacent]
+                    if total < best:
+                        best, meet = total, adjacent
+
+        if meet is None:
+            return [], inf
+
+        # join the forward and backward halves at the meeting vertex
+        path = self.build_path(previous[0], meet)
+        vertex = previous[1][meet]
+        while vertex is not None:
+            path.append(vertex)
+            vertex = previous[1][vertex]
+        return path, best
+
+    @reads
+    @instrumented
+    def astar(self, src: int, dst: int, heuristic=None) -> tuple:
+        """
+        A* search from src to dst, return (path, cost, expanded)
+        heuristic(vertex, dst) must never overestimate the remaining distance,
+        without one the search behaves like dijkstra
+        Path is empty and cost is infinity if dst can't be reached
+        """
+        inf = float('inf')
+
+        # check if both vertices are in the graph
+        if not self.has_vertex(src) or not self.has_vertex(dst):
+            return [], inf, 0
+        if heuristic is None:
+            heuristic = lambda vertex, target: 0
+
+        # heap entries are (estimated total, distance so far, vertex)
+        distances = {src: 0}
+        previous = {src: None}
+        heap = [(heuristic(src, dst), 0, src)]
+        expanded = 0
+        heappush, heappop = graph_stats.heap_ops()
+        adjacents_of = graph_stats.expand(self.sorted_adjacents)
+
+        while heap:
+            _, distance, vertex = heappop(heap)
+
+            # skip entries made stale by a shorter path to the vertex
+            if distance > distances[vertex]:
+                continue
+            expanded += 1
+
+            # the first time dst is popped its distance is final
+            if vertex == dst:
+                return self.build_path(previous, dst), distance, expanded
+
+            # relax every outgoing edge of the vertex
+            for adjacent in adjacents_of(vertex):
+                new_distance = distance + self.get_edge(vertex, adjacent)
+                if new_distance < distances.get(adjacent, inf):
+                    distances[adjacent] = new_distance
+                    previous[adjacent] = vertex
+                    heappush(heap, (new_distance + heuristic(adjacent, dst),
+                                    new_distance, adjacent))
+
+        return [], inf, expanded
+
+    @reads
+    def choose_landmarks(self, count: int) -> []:
+        """
+        Pick up to count landmark vertices spread far apart, each one the
+        vertex farthest from the landmarks already picked
+        """
+        if self.v_count == 0:
+            return []
+
+        # start at vertex 0, track each vertex's distance to the closest landmark
+        landmarks = [0]
+        closest = self.dijkstra_search(0)[0]
+
+        while len(landmarks) < min(count, self.v_count):
+            # unreached vertices count as the farthest
+            candidates = [v for v in range(self.v_count) if v not in landmarks]
+            landmark = max(candidates, key=closest.__getitem__)
+            landmarks.append(landmark)
+            distances = self.dijkstra_search(landmark)[0]
+            closest = [min(a, b) for a, b in zip(closest, distances)]
+
+        return landmarks
+
+    @reads
+    def landmark_tables(self, landmarks) -> tuple:
+        """
+        Return (from_landmark, to_landmark) distance tables for the landmarks
+        Tables are computed once and cached until the graph changes
+        """
+        key = (self.version, tuple(landmarks))
+        if self.landmarks is None or self.landmarks[0] != key:
+            from_landmark = [self.dijkstra_search(l)[0] for l in landmarks]
+            to_landmark = [self.dijkstra_search(l, reverse=True)[0] for l in landmarks]
+            self.landmarks = (key, from_landmark, to_landmark)
+        return self.landmarks[1], self.landmarks[2]
+
+    @reads
+    def alt_heuristic(self, landmarks=None, count=4):
+        """
+        Return an A* heuristic built from landmark distances (ALT), which
+        needs no coordinates, using the given landmarks or count chosen ones
+        The heuristic re-reads the tables after the graph changes, so it
+        never works from stale distances
+        """
+        if landmarks is None:
+            landmarks = self.choose_landmarks(count)
+        version = self.version
+        from_landmark, to_landmark = self.landmark_tables(landmarks)
+        inf = float('inf')
+
+        def heuristic(vertex, dst):
+            nonlocal version, from_landmark, to_landmark
+
+            # an old table could overestimate, read the current one
+            if version != self.version:
+                version = self.version
+                from_landmark, to_landmark = self.landmark_tables(landmarks)
+
+            # triangle inequality lower bounds, skipping unreached landmarks
+            best = 0
+            for from_l, to_l in zip(from_landmark, to_landmark):
+                if from_l[dst] != inf and from_l[vertex] != inf:
+                    best = max(best, from_l[dst] - from_l[vertex])
+                if to_l[vertex] != inf and to_l[dst] != inf:
+                    best = max(best, to_l[vertex] - to_l[dst])
+            return best
+
+        return heuristic
+
+    @reads
+    @instrumented
+    def all_pairs_shortest_paths(self, method='auto') -> tuple:
+        """
+        Return (distances, next_hops) matrices for every pair of vertices
+        next_hops[src][dst] is the vertex after src on the path, or None
+        method is 'floyd', 'dijkstra', 'johnson' or 'auto', the result is
+        cached and reused by any method until the graph changes
+        The matrices are copies, changing them leaves the cache alone
+        """
+        distances, next_hops = self.apsp_tables(method)
+        return [list(row) for row in distances], [list(row) for row in next_hops]
+
+    def apsp_tables(self, method='auto') -> tuple:
+        """
+        Return the cached (distances, next_hops) matrices, computed on first use
+        after a change, shared with get_distance and get_path, do not modify them
+        """
+
+        # reuse the cached matrices if the graph has not changed
+        if self.apsp is not None and self.apsp[0] == self.version:
+            return self.apsp[1], self.apsp[2]
+
+        # pick floyd for dense graphs, repeated dijkstra for sparse ones
+        if method == 'auto':
+            pairs = max(self.v_count * (self.v_count - 1), 1)
+            density = len(self.get_edges()) / pairs
+            method = 'floyd' if density >= (0.01 if np is not None else 0.25) \
+                else 'dijkstra'
+
+        # with only positive weights johnson's reweighting changes nothing,
+        # so it reduces to dijkstra from every source
+        if method == 'floyd':
+            distances, next_hops = self.floyd_warshall()
+        elif method in ('dijkstra', 'johnson'):
+            distances, next_hops = self.repeated_dijkstra()
+        else:
+            raise ValueError(f'unknown all pairs method {method!r}')
+
+        self.apsp = (self.version, distances, next_hops)
+        return distances, next_hops
+
+    def floyd_warshall(self) -> tuple:
+        """
+        Floyd-Warshall over the whole matrix, vectorized when numpy is present
+        Return (distances, next_hops) as lists of rows
+        """
+        n = self.v_count
+        inf = float('inf')
+
+        if np is not None:
+            # one matrix update per intermediate vertex
+            distances = np.full((n, n), np.inf)
+            next_hops = np.full((n, n), -1)
+            for src, dst, weight in self.get_edges():
+                distances[src, dst] = weight
+                next_hops[src, dst] = dst
+            np.fill_diagonal(distances, 0)
+            for k in range(n):
+                candidate = distances[:, k, None] + distances[None, k, :]
+                better = candidate < distances
+                distances = np.where(better, candidate, distances)
+                next_hops = np.where(better, next_hops[:, k, None], next_hops)
+
+            # convert back to plain Python numbers
+            integral = all(isinstance(w, int) for _, _, w in self.get_edges())
+            distances = [[int(d) if integral and d != inf else d for d in row]
+                         for row in distances.tolist()]
+            next_hops = [[h if h >= 0 else None for h in row]
+                         for row in next_hops.tolist()]
+            return distances, next_hops
+
+        # start from the direct edges
+        distances = [[inf] * n for _ in range(n)]
+        next_hops = [[None] * n for _ in range(n)]
+        for src, dst, weight in self.get_edges():
+            distances[src][dst] = weight
+            next_hops[src][dst] = dst
+        for vertex in range(n):
+            distances[vertex][vertex] = 0
+
+        # allow each vertex in turn as an intermediate stop
+        for k in range(n):
+            row_k = distances[k]
+            for i in range(n):
+                to_k = distances[i][k]
+                if to_k == inf or i == k:
+                    continue
+                row_i, hops_i, hop = distances[i], next_hops[i], next_hops[i][k]
+                for j in range(n):
+                    if to_k + row_k[j] < row_i[j]:
+                        row_i[j] = to_k + row_k[j]
+                        hops_i[j] = hop
+
+        return distances, next_hops
+
+    def repeated_dijkstra(self) -> tuple:
+        """
+        Heap Dijkstra from every source
+        Return (distances, next_hops) as lists of rows
+        """
+        all_distances, all_next_hops = [], []
+
+        for src in range(self.v_count):
+            distances, previous = self.dijkstra_search(src)
+
+            # the next hop of a vertex is inherited from its predecessor,
+            # so fill vertices in order of distance
+            next_hops = [None] * self.v_count
+            reached = [v for v in range(self.v_count)
+                       if previous[v] is not None]
+            reached.sort(key=distances.__getitem__)
+            for vertex in reached:
+                parent = previous[vertex]
+                next_hops[vertex] = vertex if parent == src else next_hops[parent]
+
+            all_distances.append(distances)
+            all_next_hops.append(next_hops)
+
+        return all_distances, all_next_hops
+
+    @reads
+    def get_distance(self, src: int, dst: int):
+        """
+        Return the shortest distance from src to dst from the all pairs cache
+        """
+        if not self.has_vertex(src) or not self.has_vertex(dst):
+            return float('inf')
+        distances, _ = self.apsp_tables()
+        return distances[src][dst]
+
+    @reads
+    def get_path(self, src: int, dst: int) -> []:
+        """
+        Return the shortest path from src to dst from the all pairs cache
+        Path is empty if dst can't be reached
+        """
+        if not self.has_vertex(src) or not self.has_vertex(dst):
+            return []
+        _, next_hops = self.apsp_tables()
+
+        # follow next hops until dst is reached
+        if src != dst and next_hops[src][dst] is None:
+            return []
+        path = [src]
+        while src != dst:
+            src = next_hops[src][dst]
+            path.append(src)
+        return path
+
+    # ------------------------------------------------------------------ #
+
+    # snapshot header: magic, weight typecode, vertex count, edge count
+    SNAPSHOT_MAGIC = b'DGS1'
+    SNAPSHOT_HEADER = struct.Struct('<4sc2xqq')
+
+    @staticmethod
+    def read_edge_list(path, delimiter=','):
+        """
+        Yield (src, dst, weight) edges from a delimited text file one at a time
+        Weight column is optional and defaults to 1, blank and # lines are skipped
+        """
+        with open(path, newline='') as file:
+            for row in csv.reader(file, delimiter=delimiter):
+                # skip blank lines and comments
+                if not row or row[0].startswith('#'):
+                    continue
+
+                # weights are ints unless they need to be floats
+                weight = 1
+                if len(row) > 2:
+                    try:
+                        weight = int(row[2])
+                    except ValueError:
+                        weight = float(row[2])
+
+                yield int(row[0]), int(row[1]), weight
+
+    @classmethod
+    def load_edge_list(cls, path, delimiter=','):
+        """
+        Build a graph from a delimited text file without reading it into memory
+        """
+
+        # first pass only sizes the graph and checks the weight type
+        v_count = 0
+        typecode = 'q'
+        for src, dst, weight in cls.read_edge_list(path, delimiter):
+            v_count = max(v_count, src + 1, dst + 1)
+            if isinstance(weight, float):
+                typecode = 'd'
+
+        # second pass streams the edges in
+        graph = cls()
+        graph.prepare_weights(typecode)
+        graph.add_vertices(v_count)
+        graph.add_edges_bulk(cls.read_edge_list(path, delimiter))
+        return graph
+
+    @reads
+    def write_edge_list(self, path, delimiter=',') -> None:
+        """
+        Write every edge as a src, dst, weight line, row by row
+        """
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file, delimiter=delimiter)
+            for src in range(self.v_count):
+                for dst in self.get_adjacents(src):
+                    writer.writerow((src, dst, self.get_edge(src, dst)))
+
+    @reads
+    def save_snapshot(self, path) -> None:
+        """
+        Save the graph as a binary CSR snapshot in native byte order
+        Layout: header, offsets (q), targets (i), weights (q or d)
+        """
+
+        # flatten the rows into offsets, targets and weights arrays
+        offsets = array('q', [0])
+        targets = array('i')
+        weights = []
+        for src in range(self.v_count):
+            for dst in self.get_adjacents(src):
+                targets.append(dst)
+                weights.append(self.get_edge(src, dst))
+            offsets.append(len(targets))
+
+        # store weights as ints unless one of them is a float
+        typecode = 'q' if all(isinstance(w, int) for w in weights) else 'd'
+        weights = array(typecode, weights)
+
+        with open(path, 'wb') as file:
+            file.write(self.SNAPSHOT_HEADER.pack(
+                self.SNAPSHOT_MAGIC, typecode.encode(), self.v_count, len(targets)))
+            offsets.tofile(file)
+            targets.tofile(file)
+            weights.tofile(file)
+
+    @classmethod
+    def load_snapshot(cls, path):
+        """
+        Load a graph saved with save_snapshot, reading the file through mmap
+        """
+        header = cls.SNAPSHOT_HEADER
+
+        with open(path, 'rb') as file, \
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            magic, typecode, v_count, e_count = header.unpack_from(buffer)
+            if magic != cls.SNAPSHOT_MAGIC:
+                raise ValueError(f'{path} is not a DirectedGraph snapshot')
+            typecode = typecode.decode()
+
+            # copy each section straight out of the mapped pages
+            offsets, targets, weights = array('q'), array('i'), array(typecode)
+            start = header.size
+            for section, count in ((offsets, v_count + 1), (targets, e_count),
+                                   (weights, e_count)):
+                end = start + count * section.itemsize
+                section.frombytes(buffer[start:end])
+                start = end
+
+        # allocate every vertex once, then fill storage from the CSR arrays
+        graph = cls()
+        graph.prepare_weights(typecode)
+        graph.add_vertices(v_count)
+        graph.fill_storage(offsets, targets, weights)
+
+        # rows were saved ascending, so they are the out-edge index as is
+        # and one pass in source order builds ascending in-edge rows
+        out_edges, in_edges = graph.out_edges, graph.in_edges
+        for src in range(v_count):
+            row = targets[offsets[src]:offsets[src + 1]].tolist()
+            out_edges[src] = row
+            for dst in row:
+                in_edges[dst].append(src)
+
+        # the topological order is rebuilt once, on the next query
+        graph.topo_valid = False
+        return graph
+
+
+
+class SparseDirectedGraph(DirectedGraph):
+    """
+    Directed weighted graph stored as one {dst: weight} dict per vertex
+    - memory scales with the number of edges instead of vertices squared
+    - same rules and results as DirectedGraph
+    """
+
+    def init_storage(self) -> None:
+        """
+        Store graph info as a list of adjacency dicts
+        """
+        self.adj_list = []
+
+    @reads
+    def __str__(self):
+        """
+        Return content of the graph in the same matrix form as DirectedGraph
+        """
+        if self.v_count == 0:
+            return 'EMPTY GRAPH\n'
+        out = '   |'
+        out += ' '.join(['{:2}'.format(i) for i in range(self.v_count)]) + '\n'
+        out += '-' * (self.v_count * 3 + 3) + '\n'
+        for i in range(self.v_count):
+            row = self.adj_list[i]
+            out += '{:2} |'.format(i)
+            out += ' '.join(['{:2}'.format(row.get(j, 0))
+                             for j in range(self.v_count)]) + '\n'
+        out = f"GRAPH ({self.v_count} vertices):\n{out}"
+        return out
+
+    def grow_storage(self, new_count: int) -> None:
+        """
+        Make room for new_count vertices
+        """
+
+        # a new vertex starts with no outgoing edges
+        for _ in range(new_count - self.v_count):
+            self.adj_list.append({})
+
+    def fill_storage(self, offsets, targets, weights) -> None:
+        """
+        Write CSR rows into empty storage, one dict per row
+        """
+        for src in range(self.v_count):
+            start, end = offsets[src], offsets[src + 1]
+            self.adj_list[src] = dict(zip(targets[start:end], weights[start:end]))
+
+    def get_edge(self, row, col):
+        """Takes a row and col and return the weight of the cooresponding edge"""
+
+        # missing edges have a weight of 0
+        return self.adj_list[row].get(col, 0)
+
+    def set_edge(self, row, col, weight) -> None:
+        """Store the weight of the edge at row/col, a weight of 0 removes it"""
+
+        # only existing edges are kept in the dict
+        if weight == 0:
+            self.adj_list[row].pop(col, None)
+        else:
+            self.adj_list[row][col] = weight
+
+    @reads
+    def get_edges(self) -> []:
+        """
+        Return a list of the edges in the graph
+        """
+
+        # collect edges row by row in ascending column order
+        edges = []
+        for src in range(self.v_count):
+            row = self.adj_list[src]
+            for dst in sorted(row):
+                edges.append((src, dst, row[dst]))
+
+        # return edges
+        return edges
+
+
+
+class NumpyDirectedGraph(DirectedGraph):
+    """
+    Directed weighted graph stored as a contiguous NumPy adjacency matrix
+    - capacity grows geometrically, adj_matrix is a view of the used part
+    - row scans, bfs frontiers and dijkstra relaxation run as array operations
+    - same rules and results as DirectedGraph, requires numpy
+    """
+
+    # number of frontier rows scanned per block in bfs
+    BFS_BLOCK = 256
+
+    def __init__(self, start_edges=None, dtype=None):
+        """
+        Store graph info as a NumPy matrix of the given weight dtype
+        Without a dtype weights start as int64, the first fractional weight
+        widens the matrix to float64; an integer dtype rejects them instead
+        """
+        if np is None:
+            raise ImportError('NumpyDirectedGraph requires numpy')
+        self.fixed_dtype = dtype is not None
+        self.dtype = np.dtype(dtype if dtype is not None else np.int64)
+        self.integral = np.issubdtype(self.dtype, np.integer)
+        super().__init__(start_edges)
+
+    def init_storage(self) -> None:
+        """
+        Start with an empty matrix, capacity is allocated on demand
+        """
+        self.buffer = np.zeros((0, 0), dtype=self.dtype)
+
+    @property
+    def adj_matrix(self):
+        """
+        Return the v_count x v_count view of the matrix in use
+        """
+        return self.buffer[:self.v_count, :self.v_count]
+
+    def grow_storage(self, new_count: int) -> None:
+        """
+        Make room for new_count vertices
+        """
+
+        # at least double the capacity when it runs out
+        capacity = len(self.buffer)
+        if new_count > capacity:
+            capacity = max(new_count, 2 * capacity)
+            buffer = np.zeros((capacity, capacity), dtype=self.dtype)
+            buffer[:self.v_count, :self.v_count] = self.adj_matrix
+            self.buffer = buffer
+
+    def get_edge(self, row, col):
+        """Takes a row and col and return the weight of the cooresponding edge"""
+
+        # return a plain Python number
+        return self.adj_matrix[row, col].item()
+
+    def prepare_weights(self, typecode) -> None:
+        """
+        Get storage ready for weights of an array typecode, 'q' or 'd'
+        """
+
+        # float weights need a float matrix, unless the dtype was chosen
+        if typecode == 'd' and self.integral and not self.fixed_dtype:
+            self.widen()
+
+    def widen(self) -> None:
+        """
+        Convert the matrix to float64 so fractional weights fit
+        """
+        self.dtype = np.dtype(np.float64)
+        self.integral = False
+        self.buffer = self.buffer.astype(self.dtype)
+
+    def fill_storage(self, offsets, targets, weights) -> None:
+        """
+        Write CSR rows into empty storage with one scatter over every edge
+        """
+        if len(targets) == 0:
+            return
+
+        # repeat each source once per edge in its row
+        counts = np.diff(np.frombuffer(offsets, dtype=np.int64))
+        rows = np.repeat(np.arange(self.v_count), counts)
+        cols = np.frombuffer(targets, dtype=np.int32)
+        self.buffer[rows, cols] = np.frombuffer(weights, dtype=weights.typecode)
+
+    def set_edge(self, row, col, weight) -> None:
+        """Store the weight of the edge at row/col, a weight of 0 removes it"""
+
+        # an integer matrix would truncate a fractional weight
+        if self.integral and weight != int(weight):
+            if self.fixed_dtype:
+                raise ValueError(f'weight {weight} does not fit the {self.dtype} matrix')
+            self.widen()
+
+        # write edge at row/col
+        self.buffer[row, col] = weight
+
+    @reads
+    def get_edges(self) -> []:
+        """
+        Return a list of the edges in the graph
+        """
+
+        # nonzero returns coordinates in row major order
+        matrix = self.adj_matrix
+        rows, cols = np.nonzero(matrix)
+        return list(zip(rows.tolist(), cols.tolist(), matrix[rows, cols].tolist()))
+
+    @reads
+    @instrumented
+    @cached_query
+    def bfs(self, v_start, v_end=None) -> []:
+        """
+        Return list of vertices visited during BFS search
+        Vertices are picked in alphabetical order, one frontier at a time
+        """
+
+        # check if starting vertex is in the graph
+        if not self.has_vertex(v_start):
+            return []
+
+        # check if end is valid
+        if not self.has_vertex(v_end):
+            v_end = None
+
+        matrix = self.adj_matrix
+        unseen = np.ones(self.v_count, dtype=bool)
+        unseen[v_start] = False
+        frontier = np.array([v_start])
+        visited = [v_start]
+
+        while len(frontier) and v_start != v_end:
+            # the whole frontier is expanded at once
+            if graph_stats.ENABLED:
+                graph_stats.add('vertices_expanded', len(frontier))
+                graph_stats.add('edges_relaxed',
+                                sum(map(self.out_degree, frontier.tolist())))
+
+            # collect unseen adjacents of the frontier, block by block,
+            # ordered by frontier position and then ascending vertex
+            found = []
+            for i in range(0, len(frontier), self.BFS_BLOCK):
+                block = matrix[frontier[i:i + self.BFS_BLOCK]] != 0
+                block &= unseen
+                found.append(np.nonzero(block)[1])
+            found = np.concatenate(found)
+
+            # keep the first discovery of each vertex, in discovery order
+            _, first = np.unique(found, return_index=True)
+            frontier = found[np.sort(first)]
+            unseen[frontier] = False
+            level = frontier.tolist()
+
+            # if end has been reached, return the visits up to it
+            if v_end is not None and not unseen[v_end]:
+                visited.extend(level[:level.index(v_end) + 1])
+                return visited
+            visited.extend(level)
+
+        # return results
+        return visited
+
+    @reads
+    @instrumented
+    def bfs_levels(self, sources, max_depth=None) -> tuple:
+        """
+        Level synchronous BFS from one or more source vertices, one frontier
+        of rows at a time
+        Return (levels, parents) as array('i'), -1 where a vertex is unreached
+        """
+
+        # accept a single source as well as an iterable of sources
+        if isinstance(sources, Integral):
+            sources = [sources]
+
+        levels = np.full(self.v_count, -1, dtype=np.int32)
+        parents = np.full(self.v_count, -1, dtype=np.int32)
+        unseen = np.ones(self.v_count, dtype=bool)
+
+        # the first frontier is every valid source, once
+        frontier = [src for src in dict.fromkeys(sources) if self.has_vertex(src)]
+        frontier = np.array(frontier, dtype=np.intp)
+        unseen[frontier] = False
+        levels[frontier] = 0
+
+        matrix = self.adj_matrix
+        depth = 0
+        while len(frontier) and (max_depth is None or depth < max_depth):
+            depth += 1
+            if graph_stats.ENABLED:
+                graph_stats.add('vertices_expanded', len(frontier))
+                graph_stats.add('edges_relaxed',
+                                sum(map(self.out_degree, frontier.tolist())))
+
+            # unseen adjacents of the frontier and the row that found them,
+            # ordered by frontier position and then ascending vertex
+            found, found_by = [], []
+            for i in range(0, len(frontier), self.BFS_BLOCK):
+                rows = frontier[i:i + self.BFS_BLOCK]
+                block = matrix[rows] != 0
+                block &= unseen
+                row, col = np.nonzero(block)
+                found.append(col)
+                found_by.append(rows[row])
+            found, found_by = np.concatenate(found), np.concatenate(found_by)
+
+            # the first frontier vertex to find a vertex is its parent
+            _, first = np.unique(found, return_index=True)
+            first.sort()
+            frontier = found[first]
+            parents[frontier] = found_by[first]
+            levels[frontier] = depth
+            unseen[frontier] = False
+
+        # hand back the same compact arrays as the other backends
+        return array('i', levels.tobytes()), array('i', parents.tobytes())
+
+    @reads
+    def dijkstra_search(self, sources, dst=None, reverse=False) -> tuple:
+        """
+        Dense Dijkstra from one or more source vertices, one row per step
+        Return (distances, previous), stop early once dst is settled
+        With reverse, follow edges backward to get distances to the sources
+        """
+
+        # accept a single source as well as an iterable of sources
+        if isinstance(sources, Integral):
+            sources = [sources]
+
+        # an empty graph has nothing to settle
+        if self.v_count == 0:
+            return [], []
+
+        # rows of the transposed matrix are the incoming edges
+        matrix = self.adj_matrix.T if reverse else self.adj_matrix
+        distances = np.full(self.v_count, np.inf)
+        previous = np.full(self.v_count, -1)
+        settled = np.zeros(self.v_count, dtype=bool)
+        for src in sources:
+            if 0 <= src < self.v_count:
+                distances[src] = 0
+        counting = graph_stats.ENABLED
+
+        while True:
+            # pick the closest unsettled vertex, lowest index on ties
+            vertex = int(np.argmin(np.where(settled, np.inf, distances)))
+            if settled[vertex] or distances[vertex] == np.inf:
+                break
+            settled[vertex] = True
+
+            # in single target mode, dst is final once it is settled
+            if vertex == dst:
+                break
+
+            # relax the whole row at once
+            if counting:
+                graph_stats.add('vertices_expanded')
+                graph_stats.add('edges_relaxed', self.in_degree(vertex) if reverse
+                                else self.out_degree(vertex))
+            row = matrix[vertex]
+            candidate = distances[vertex] + row
+            better = (row > 0) & ~settled & (candidate < distances)
+            distances[better] = candidate[better]
+            previous[better] = vertex
+
+        # convert back to plain Python lists like the other backends
+        integral = self.integral
+        distances = [int(d) if integral and d != np.inf else float(d)
+                     for d in distances.tolist()]
+        previous = [p if p >= 0 else None for p in previous.tolist()]
+        return distances, previous
+
 
 
 if __name__ == '__main__':
@@ -510,3 +2096,59 @@ if __name__ == '__main__':
     print('\n', g)
     for i in range(5):
         print(f'DIJKSTRA {i} {g.dijkstra(i)}')
+
+    print("\nmethod shortest_path() / dijkstra_search() example 1")
+    print("----------------------------------------------------")
+    edges = [(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+             (3, 1, 5), (2, 1, 23), (3, 2, 7)]
+    g = DirectedGraph(edges)
+    for src, dst in [(0, 2), (2, 0), (3, 4)]:
+        print(f'PATH {src}-{dst} {g.shortest_path(src, dst)}')
+    print(f'MULTI-SOURCE [2, 4] {g.dijkstra_search([2, 4])}')
+
+    print("\nmethod all_pairs_shortest_paths() example 1")
+    print("-------------------------------------------")
+    distances, _ = g.all_pairs_shortest_paths()
+    for i in range(5):
+        print(f'ALL PAIRS {i} {distances[i]}')
+    print(f'PATH 0-2 {g.get_path(0, 2)} {g.get_distance(0, 2)}')
+
+    print("\nmethod topological_sort() / critical_path() example 1")
+    print("-----------------------------------------------------")
+    edges = [(0, 1, 3), (0, 2, 2), (1, 3, 4), (2, 3, 1), (3, 4, 2), (2, 4, 9)]
+    g = DirectedGraph(edges)
+    print(g.topological_sort(), g.topological_order())
+    print(f'DAG SHORTEST 0 {g.dag_shortest_paths(0)}')
+    print(f'DAG LONGEST 0 {g.dag_longest_paths(0)}')
+    print(f'CRITICAL PATH {g.critical_path()}')
+
+    print("\nmethod strongly_connected_components() example 1")
+    print("------------------------------------------------")
+    edges = [(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+             (3, 1, 5), (2, 1, 23), (3, 2, 7), (5, 6, 1), (6, 5, 2), (2, 5, 4)]
+    g = DirectedGraph(edges)
+    print(list(g.strongly_connected_components()))
+    condensed, _ = g.condensation()
+    print(condensed.get_edges(), condensed.has_cycle())
+
+    print("\nSparseDirectedGraph example 1")
+    print("-----------------------------")
+    edges = [(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+             (3, 1, 5), (2, 1, 23), (3, 2, 7)]
+    g = SparseDirectedGraph(edges)
+    print(g)
+    print(g.get_edges(), g.has_cycle(), sep='\n')
+    for start in range(5):
+        print(f'{start} DFS:{g.dfs(start)} BFS:{g.bfs(start)}')
+    for i in range(5):
+        print(f'DIJKSTRA {i} {g.dijkstra(i)}')
+
+    print("\nmethod bfs_levels() example 1")
+    print("-----------------------------")
+    edges = [(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+             (3, 1, 5), (2, 1, 23), (3, 2, 7)]
+    g = DirectedGraph(edges)
+    for start in range(5):
+        levels, parents = g.bfs_levels(start)
+        print(f'{start} LEVELS:{levels.tolist()} PARENTS:{parents.tolist()}')
+    print(g.bfs_levels([0, 2], max_depth=1)[0].tolist())
@@ -0,0 +1,112 @@
+# Course: CS261 - Data Structures
+# Author: Rex Fagin
+# Assignment: HW6
+# Description: Result cache shared by the directed and undirected graphs
+
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+class QueryCache:
+    """
+    Least recently used cache of graph query results
+    - every entry belongs to one graph version
+    - a new version drops all older entries
+    - keeps hit and miss counts
+    - safe to share between threads, results are computed outside the lock
+    """
+
+    def __init__(self, maxsize=128):
+        """
+        Start empty, a maxsize of 0 disables caching
+        """
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, version, compute):
+        """
+        Return the cached result for key at version, calling compute on a miss
+        """
+
+        with self.lock:
+            # results of an older version can never be used again
+            if version != self.version:
+                self.entries.clear()
+                self.version = version
+
+            # on a hit, mark the entry as most recently used
+            if key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return self.entries[key]
+
+            self.misses += 1
+
+        # compute without the lock, other threads may look up meanwhile
+        result = compute()
+
+        # store the result, dropping least recently used entries
+        # a result for a version that was replaced meanwhile is not kept
+        with self.lock:
+            if self.maxsize > 0 and version == self.version:
+                self.entries[key] = result
+                while len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+
+        return result
+
+    def resize(self, maxsize) -> None:
+        """
+        Change the size bound, dropping least recently used entries over it
+        """
+        with self.lock:
+            self.maxsize = maxsize
+            while len(self.entries) > max(maxsize, 0):
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Drop every entry and reset the counts
+        """
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """
+        Return hit and miss counts, current size and size bound
+        """
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'size': len(self.entries), 'maxsize': self.maxsize}
+
+
+def cached_query(method):
+    """
+    Cache a graph method on its arguments, their types and the graph's version
+    List results are copied so callers can't change the cached value,
+    so a hit costs one O(n) list copy instead of O(1)
+    """
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        # caching turned off, no key, lock or copy
+        if self.query_cache.maxsize <= 0:
+            return method(self, *args, **kwargs)
+
+        # argument types are part of the key, 1, 1.0 and True are equal
+        # but a method may treat them differently
+        key = (method.__name__, tuple((type(a), a) for a in args),
+               tuple(sorted((k, type(v), v) for k, v in kwargs.items())))
+        result = self.query_cache.get(
+            key, self.version, lambda: method(self, *args, **kwargs))
+        if isinstance(result, list):
+            return list(result)
+        return result
+
+    return wrapper
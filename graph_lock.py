@@ -0,0 +1,218 @@
+# Course: CS261 - Data Structures
+# Author: Rex Fagin
+# Assignment: HW6
+# Description: Readers-writer lock shared by the directed and undirected graphs
+
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+class RWLock:
+    """
+    Readers-writer lock
+    - any number of readers, or one writer
+    - a waiting writer blocks new readers, so writers can't starve
+    - reentrant per thread, a writer may also read, a reader may not write
+    """
+
+    def __init__(self):
+        """
+        Start unlocked
+        """
+        self.cond = threading.Condition(threading.Lock())
+        self.readers = 0
+        self.writing = False
+        self.writers_waiting = 0
+
+        # per thread hold depth and mode, nested holds only count
+        self.local = threading.local()
+
+    def acquire(self, write=False) -> None:
+        """
+        Take the lock for reading, or for writing if write is True
+        """
+        local = self.local
+        depth = getattr(local, 'depth', 0)
+
+        # already held by this thread, only count the nested hold
+        if depth:
+            if write and not local.write:
+                raise RuntimeError('a read lock can not be upgraded to a write lock')
+            local.depth = depth + 1
+            return
+
+        with self.cond:
+            if write:
+                # wait for the current readers and writer to finish
+                self.writers_waiting += 1
+                try:
+                    while self.writing or self.readers:
+                        self.cond.wait()
+                finally:
+                    self.writers_waiting -= 1
+                self.writing = True
+            else:
+                # let waiting writers go first
+                while self.writing or self.writers_waiting:
+                    self.cond.wait()
+                self.readers += 1
+
+        local.depth = 1
+        local.write = write
+
+    def release(self) -> None:
+        """
+        Release one hold of the lock taken by this thread
+        """
+        local = self.local
+        local.depth -= 1
+        if local.depth:
+            return
+
+        with self.cond:
+            if local.write:
+                self.writing = False
+                self.cond.notify_all()
+            else:
+                self.readers -= 1
+                if self.readers == 0:
+                    self.cond.notify_all()
+
+    @contextmanager
+    def read(self):
+        """
+        Hold the lock for reading, to run several queries on one version
+        """
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    @contextmanager
+    def write(self):
+        """
+        Hold the lock for writing, to publish several changes at once
+        """
+        self.acquire(write=True)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+def reads(method):
+    """
+    Run a graph method under the graph's read lock, if it has one
+    """
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        lock = self.lock
+        if lock is None:
+            return method(self, *args, **kwargs)
+        lock.acquire()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            lock.release()
+
+    return wrapper
+
+
+def writes(method):
+    """
+    Run a graph method under the graph's write lock, if it has one
+    """
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        lock = self.lock
+        if lock is None:
+            return method(self, *args, **kwargs)
+        lock.acquire(write=True)
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            lock.release()
+
+    return wrapper
+
+
+
+if __name__ == '__main__':
+
+    import time
+    from d_graph import DirectedGraph, SparseDirectedGraph, NumpyDirectedGraph, np
+    from ud_graph import UndirectedGraph
+
+    def stress(graph, write, check, writes=200, readers=4):
+        """
+        Run writes batches of changes against reader threads running check
+        Return the number of torn reads, a failed check or an exception
+        """
+        done = threading.Event()
+        torn = []
+
+        def reader():
+            while not done.is_set():
+                try:
+                    if not check(graph):
+                        torn.append('inconsistent')
+                except Exception as error:
+                    torn.append(repr(error))
+
+        threads = [threading.Thread(target=reader) for _ in range(readers)]
+        for thread in threads:
+            thread.start()
+
+        # each batch of changes is published as one write
+        for step in range(writes):
+            with graph.lock.write():
+                write(graph, step)
+            time.sleep(0)
+
+        done.set()
+        for thread in threads:
+            thread.join()
+        return torn
+
+    def grow_chain(graph, step):
+        # add a vertex, resizing the storage, and link it to the chain
+        graph.add_vertex()
+        graph.add_edge(graph.v_count - 2, graph.v_count - 1, 1)
+
+    def check_chain(graph):
+        # every vertex is on the chain, one more step from 0 than the last
+        with graph.lock.read():
+            chain = list(range(graph.v_count))
+            return graph.dijkstra(0) == chain and graph.bfs(0) == chain
+
+    print("\nRWLock stress test example 1")
+    print("----------------------------")
+    classes = [DirectedGraph, SparseDirectedGraph]
+    if np is not None:
+        classes.append(NumpyDirectedGraph)
+    for cls in classes:
+        g = cls([(0, 1, 1)]).enable_locking()
+        torn = stress(g, grow_chain, check_chain)
+        print(f'{cls.__name__}: {g.v_count} vertices, torn reads: {len(torn)}')
+
+    def add_spoke(graph, step):
+        # a new vertex joins the ring between r0 and r1, as a detour
+        graph.remove_edge('r0', 'r1')
+        graph.add_edge('r0', f'n{step}')
+        graph.add_edge(f'n{step}', 'r1')
+        graph.add_edge('r0', 'r1')
+
+    def check_spokes(graph):
+        # one component, and one more edge than spokes per version
+        with graph.lock.read():
+            vertices, edges = graph.get_vertices(), graph.get_edges()
+            return graph.count_connected_components() == 1 and \
+                len(edges) == 2 * (len(vertices) - 2) + 1 and \
+                len(graph.bfs('r0')) == len(vertices)
+
+    g = UndirectedGraph([('r0', 'r1')]).enable_locking()
+    torn = stress(g, add_spoke, check_spokes)
+    print(f'UndirectedGraph: {len(g.get_vertices())} vertices, torn reads: {len(torn)}')
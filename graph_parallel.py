@@ -0,0 +1,227 @@
+# Course: CS261 - Data Structures
+# Author: Rex Fagin
+# Assignment: HW6
+# Description: Batch BFS and Dijkstra from many sources with a process pool
+
+import heapq
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from numbers import Integral
+
+from d_graph import DirectedGraph
+from ud_graph import UndirectedGraph
+
+# CSR file header: vertex count, neighbor entries, weight typecode
+CSR_HEADER = struct.Struct('<qqc7x')
+
+# graph shared with the tasks of one worker process, set by attach_worker
+worker = {}
+
+
+def write_csr(graph, path) -> []:
+    """
+    Write a read-only copy of graph to path as compressed sparse rows
+    Neighbors are stored in traversal order, so workers never sort
+    Return the vertex names for an UndirectedGraph, None otherwise
+    """
+    offsets = array('q', [0])
+    targets = array('i')
+    weights = []
+
+    if isinstance(graph, UndirectedGraph):
+        # number the vertices, keep neighbors in alphabetical order
+        names = list(graph.ids)
+        index = {name: i for i, name in enumerate(names)}
+        for name in names:
+            targets.extend(index[adjacent] for adjacent in graph.iter_neighbors(name))
+            offsets.append(len(targets))
+        typecode = 'q'
+    else:
+        # vertices are already numbered, keep neighbors ascending
+        names = None
+        for src in range(graph.v_count):
+            for dst in graph.sorted_adjacents(src):
+                targets.append(dst)
+                weights.append(graph.get_edge(src, dst))
+            offsets.append(len(targets))
+        typecode = 'q' if all(isinstance(w, int) for w in weights) else 'd'
+    weights = array(typecode, weights)
+
+    with open(path, 'wb') as file:
+        file.write(CSR_HEADER.pack(len(offsets) - 1, len(targets), typecode.encode()))
+        offsets.tofile(file)
+        targets.tofile(file)
+        weights.tofile(file)
+
+    return names
+
+
+def attach_worker(path, names) -> None:
+    """
+    Pool initializer, map the CSR file once per worker process
+    Every worker reads the same pages, nothing is copied per task
+    """
+    with open(path, 'rb') as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    v_count, e_count, typecode = CSR_HEADER.unpack_from(buffer)
+    view = memoryview(buffer)
+
+    # cast each section of the mapping to its element type
+    start = CSR_HEADER.size
+    offsets = view[start:start + (v_count + 1) * 8].cast('q')
+    start += (v_count + 1) * 8
+    targets = view[start:start + e_count * 4].cast('i')
+    start += e_count * 4
+    weights = view[start:].cast(typecode.decode())
+
+    worker.update(buffer=buffer, v_count=v_count, offsets=offsets,
+                  targets=targets, weights=weights, names=names,
+                  index={name: i for i, name in enumerate(names or ())})
+
+
+def worker_vertex(source):
+    """Return the row of source in the shared graph, or None if it is missing"""
+    if worker['names'] is not None:
+        return worker['index'].get(source)
+    # NumPy integer sources are valid vertices too, like in has_vertex
+    if isinstance(source, Integral) and 0 <= source < worker['v_count']:
+        return int(source)
+    return None
+
+
+def bfs_task(sources) -> []:
+    """
+    Return (source, visited) for each source, visited like graph.bfs(source)
+    """
+    offsets, targets, names = worker['offsets'], worker['targets'], worker['names']
+    results = []
+
+    for source in sources:
+        start = worker_vertex(source)
+        if start is None:
+            results.append((source, []))
+            continue
+
+        # queue every vertex once, neighbors are already in order
+        seen = bytearray(worker['v_count'])
+        seen[start] = True
+        visited = []
+        vertex_deque = deque([start])
+        while vertex_deque:
+            vertex = vertex_deque.popleft()
+            visited.append(vertex)
+            for i in range(offsets[vertex], offsets[vertex + 1]):
+                adjacent = targets[i]
+                if not seen[adjacent]:
+                    seen[adjacent] = True
+                    vertex_deque.append(adjacent)
+
+        if names is not None:
+            visited = [names[vertex] for vertex in visited]
+        results.append((source, visited))
+
+    return results
+
+
+def dijkstra_task(sources) -> []:
+    """
+    Return (source, distances) for each source, distances like graph.dijkstra(source)
+    """
+    offsets, targets, weights = worker['offsets'], worker['targets'], worker['weights']
+    v_count = worker['v_count']
+    results = []
+
+    for source in sources:
+        distances = [float('inf')] * v_count
+        start = worker_vertex(source)
+        if start is None:
+            results.append((source, distances))
+            continue
+
+        # heap Dijkstra over the shared rows
+        settled = bytearray(v_count)
+        distances[start] = 0
+        heap = [(0, start)]
+        while heap:
+            distance, vertex = heapq.heappop(heap)
+            if settled[vertex]:
+                continue
+            settled[vertex] = True
+            for i in range(offsets[vertex], offsets[vertex + 1]):
+                adjacent = targets[i]
+                new_distance = distance + weights[i]
+                if not settled[adjacent] and new_distance < distances[adjacent]:
+                    distances[adjacent] = new_distance
+                    heapq.heappush(heap, (new_distance, adjacent))
+
+        results.append((source, distances))
+
+    return results
+
+
+def run_batch(graph, sources, task, max_workers, chunk_size):
+    """
+    Share graph through a mapped file, spread sources over a process pool
+    and yield each (source, result) as soon as its chunk finishes
+    """
+    sources = list(sources)
+    handle, path = tempfile.mkstemp(suffix='.csr')
+    os.close(handle)
+
+    try:
+        names = write_csr(graph, path)
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=attach_worker,
+                                 initargs=(path, names)) as executor:
+            futures = [executor.submit(task, sources[i:i + chunk_size])
+                       for i in range(0, len(sources), chunk_size)]
+            try:
+                for future in as_completed(futures):
+                    yield from future.result()
+            finally:
+                # a consumer that stops early cancels the remaining chunks
+                for future in futures:
+                    future.cancel()
+    finally:
+        os.remove(path)
+
+
+def parallel_bfs(graph, sources, max_workers=None, chunk_size=64):
+    """
+    Yield (source, visited) for every source in completion order
+    Works on DirectedGraph and UndirectedGraph, visited matches graph.bfs(source)
+    """
+    yield from run_batch(graph, sources, bfs_task, max_workers, chunk_size)
+
+
+def parallel_dijkstra(graph, sources, max_workers=None, chunk_size=16):
+    """
+    Yield (source, distances) for every source in completion order
+    Works on DirectedGraph, distances match graph.dijkstra(source)
+    """
+    if not isinstance(graph, DirectedGraph):
+        raise TypeError('parallel_dijkstra needs a weighted DirectedGraph')
+    yield from run_batch(graph, sources, dijkstra_task, max_workers, chunk_size)
+
+
+
+if __name__ == '__main__':
+
+    print("\nmethod parallel_bfs() / parallel_dijkstra() example 1")
+    print("-----------------------------------------------------")
+    edges = [(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+             (3, 1, 5), (2, 1, 23), (3, 2, 7)]
+    g = DirectedGraph(edges)
+    for source, visited in sorted(parallel_bfs(g, range(5), max_workers=2)):
+        print(f'{source} BFS:{visited}')
+    for source, distances in sorted(parallel_dijkstra(g, range(5), max_workers=2)):
+        print(f'DIJKSTRA {source} {distances}')
+
+    edges = ['AE', 'AC', 'BE', 'CE', 'CD', 'CB', 'BD', 'ED', 'BH', 'QG', 'FG']
+    g = UndirectedGraph(edges)
+    for source, visited in sorted(parallel_bfs(g, 'ABCDEGH', max_workers=2)):
+        print(f'{source} BFS:{visited}')
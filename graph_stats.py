@@ -0,0 +1,197 @@
+# Course: CS261 - Data Structures
+# Author: Rex Fagin
+# Assignment: HW6
+# Description: Optional operation counters, timing histograms and hooks
+#              shared by the directed and undirected graphs
+
+import heapq
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+# module-level switch, while False every hook returns the plain function
+ENABLED = False
+
+# wall time histograms, one per operation name, changed under histograms_lock
+histograms = {}
+histograms_lock = threading.Lock()
+
+# callbacks run after every instrumented call as callback(name, seconds, counts)
+subscribers = []
+
+# counts of the instrumented calls running in each thread, innermost last
+local = threading.local()
+
+
+class Histogram:
+    """
+    Wall times in power of two buckets
+    - bucket i holds times under 2 ** i microseconds
+    - keeps count, total, min and max exactly
+    """
+
+    BUCKETS = 40
+
+    def __init__(self):
+        """
+        Start with no recorded times
+        """
+        self.buckets = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def record(self, seconds) -> None:
+        """
+        Add one wall time to the histogram
+        """
+        i = min(int(seconds * 1e6).bit_length(), self.BUCKETS - 1)
+        self.buckets[i] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def percentile(self, p):
+        """
+        Return an upper bound on the p-th percentile time, in seconds
+        """
+        if self.count == 0:
+            return None
+
+        # walk buckets until p percent of the times are covered
+        target = p / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return min(2 ** i / 1e6, self.max)
+        return self.max
+
+    def stats(self) -> dict:
+        """
+        Return count, total, mean, min, max and approximate percentiles
+        """
+        if self.count == 0:
+            return {'count': 0}
+        return {'count': self.count, 'total': self.total,
+                'mean': self.total / self.count, 'min': self.min, 'max': self.max,
+                'p50': self.percentile(50), 'p90': self.percentile(90),
+                'p99': self.percentile(99)}
+
+
+def enable() -> None:
+    """Turn instrumentation on for every graph"""
+    global ENABLED
+    ENABLED = True
+
+
+def disable() -> None:
+    """Turn instrumentation off, recorded histograms are kept"""
+    global ENABLED
+    ENABLED = False
+
+
+def reset() -> None:
+    """Drop every recorded histogram"""
+    with histograms_lock:
+        histograms.clear()
+
+
+def summary() -> dict:
+    """Return the stats of every histogram by operation name"""
+    with histograms_lock:
+        return {name: histogram.stats() for name, histogram in histograms.items()}
+
+
+def subscribe(callback) -> None:
+    """Call callback(name, seconds, counts) after every instrumented call"""
+    subscribers.append(callback)
+
+
+def unsubscribe(callback) -> None:
+    """Stop calling callback, if it was subscribed"""
+    if callback in subscribers:
+        subscribers.remove(callback)
+
+
+def add(name, n=1) -> None:
+    """Add n to a counter of the innermost instrumented call, if any"""
+    stack = getattr(local, 'stack', None)
+    if stack:
+        stack[-1][name] += n
+
+
+def instrumented(method):
+    """
+    Time a graph method and collect the counters it adds, while enabled
+    Counts of nested instrumented calls also go to the outer call
+    """
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        # disabled, one global check and the plain call
+        if not ENABLED:
+            return method(self, *args, **kwargs)
+
+        stack = getattr(local, 'stack', None)
+        if stack is None:
+            stack = local.stack = []
+        counts = Counter()
+        stack.append(counts)
+        start = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            stack.pop()
+            if stack:
+                stack[-1].update(counts)
+
+            # record the time, then tell every subscriber
+            name = f'{type(self).__name__}.{method.__name__}'
+            with histograms_lock:
+                if name not in histograms:
+                    histograms[name] = Histogram()
+                histograms[name].record(seconds)
+            for callback in list(subscribers):
+                callback(name, seconds, dict(counts))
+
+    return wrapper
+
+
+def expand(neighbors):
+    """
+    Return neighbors(vertex) counting one vertex expanded and every edge
+    it returns as relaxed, or neighbors itself while disabled
+    """
+    if not ENABLED:
+        return neighbors
+
+    def counted(vertex):
+        result = neighbors(vertex)
+        add('vertices_expanded')
+        add('edges_relaxed', len(result))
+        return result
+
+    return counted
+
+
+def heap_ops() -> tuple:
+    """
+    Return (heappush, heappop), counting each call while enabled
+    """
+    if not ENABLED:
+        return heapq.heappush, heapq.heappop
+
+    def heappush(heap, item):
+        add('heap_ops')
+        heapq.heappush(heap, item)
+
+    def heappop(heap):
+        add('heap_ops')
+        return heapq.heappop(heap)
+
+    return heappush, heappop
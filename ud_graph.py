@@ -3,7 +3,252 @@
 # Assignment: HW6
 # Description: Methods for an undirected Graph
 
+import csv
+import mmap
+import struct
+from array import array
 from collections import deque
+from collections.abc import Mapping
+
+import graph_stats
+from graph_cache import QueryCache, cached_query
+from graph_lock import RWLock, reads, writes
+from graph_stats import instrumented
+
+class NeighborArray:
+    """
+    Insertion ordered set of neighbor ids, stored as an int array
+    - items keeps insertion order, 4 bytes per neighbor
+    - rows of INDEX_MIN or more neighbors also keep index, each id's
+      position in items, for O(1) add, discard and membership checks;
+      there a removed neighbor leaves a -1 hole until the next compaction
+    - shorter rows are scanned, which beats a dict per row in memory
+    - ordered keeps the names' sorted order, rebuilt on first use after a change
+    """
+    __slots__ = ('names', 'items', 'index', 'holes', 'ordered')
+
+    INDEX_MIN = 16
+
+    def __init__(self, names):
+        """
+        Start with no neighbors, names maps each id back to its name
+        """
+        self.names = names
+        self.items = array('i')
+        self.index = None
+        self.holes = 0
+        self.ordered = None
+
+    def __repr__(self):
+        """
+        Show neighbor names as a list in insertion order
+        """
+        names = self.names
+        return repr([names[item] for item in self])
+
+    def __contains__(self, item):
+        index = self.index
+        if index is None:
+            return item in self.items
+        return item in index
+
+    def __iter__(self):
+        # close the holes left by discard before walking the array
+        if self.holes:
+            self.compact()
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items) - self.holes
+
+    def add(self, item) -> None:
+        """
+        Add item if it is not already a neighbor
+        """
+        if item in self:
+            return
+
+        index = self.index
+        if index is not None:
+            index[item] = len(self.items)
+        self.items.append(item)
+
+        # a row that just grew long enough gets its index
+        if index is None and len(self.items) >= self.INDEX_MIN:
+            self.compact()
+
+        # the sorted view is rebuilt on next use
+        self.ordered = None
+
+    def discard(self, item) -> None:
+        """
+        Remove item if it is a neighbor
+        """
+        index = self.index
+
+        # short row, remove from the array directly
+        if index is None:
+            if item in self.items:
+                self.items.remove(item)
+                self.ordered = None
+            return
+
+        i = index.pop(item, None)
+        if i is not None:
+            # leave a hole instead of shifting the rest of the array
+            self.items[i] = -1
+            self.holes += 1
+            self.ordered = None
+
+            # compact once holes outnumber neighbors, O(1) amortized
+            if self.holes > len(index):
+                self.compact()
+
+    def compact(self) -> None:
+        """
+        Drop holes and repeated ids, keeping first occurrences, and
+        rebuild the index if the row is long enough to need one
+        """
+        items = self.items
+        unique = dict.fromkeys(items)
+        unique.pop(-1, None)
+        if len(unique) != len(items):
+            items = array('i', unique)
+
+        index = None
+        if len(items) >= self.INDEX_MIN:
+            index = dict(zip(items, range(len(items))))
+
+        # build the new arrays first so readers never see them half done
+        self.index = index
+        self.items = items
+        self.holes = 0
+
+    def dedupe(self) -> None:
+        """
+        Drop repeated ids after unchecked appends to items and rebuild the index
+        """
+        self.compact()
+
+        # the sorted view is rebuilt on next use
+        self.ordered = None
+
+    def sorted(self):
+        """
+        Return neighbor ids in ascending name order, do not modify the result
+        """
+
+        # build the sorted view on first use
+        if self.ordered is None:
+            self.ordered = array('i', sorted(self, key=self.names.__getitem__))
+        return self.ordered
+
+
+class NeighborNames:
+    """
+    Read-only view of one vertex's neighbors by name, in insertion order
+    """
+    __slots__ = ('ids', 'row')
+
+    def __init__(self, ids, row):
+        """
+        Wrap the NeighborArray row, ids maps each name to its id
+        """
+        self.ids = ids
+        self.row = row
+
+    def __repr__(self):
+        return repr(self.row)
+
+    def __contains__(self, v):
+        i = self.ids.get(v)
+        return i is not None and i in self.row
+
+    def __iter__(self):
+        return map(self.row.names.__getitem__, self.row)
+
+    def __len__(self):
+        return len(self.row)
+
+
+class AdjacencyView(Mapping):
+    """
+    Read-only mapping of vertex name to the names of its neighbors
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, v):
+        graph = self.graph
+        return NeighborNames(graph.ids, graph.neighbors[graph.ids[v]])
+
+    def __iter__(self):
+        return iter(self.graph.ids)
+
+    def __len__(self):
+        return len(self.graph.ids)
+
+
+class DisjointSet:
+    """
+    Union-find over vertex ids
+    - path compression and union by rank
+    - keeps a running count of disjoint sets
+    """
+
+    def __init__(self):
+        """
+        Start with no items and no sets
+        """
+        self.parent = dict()
+        self.rank = dict()
+        self.count = 0
+
+    def add(self, item) -> None:
+        """
+        Add item as a new set of its own
+        """
+        if item not in self.parent:
+            self.parent[item] = item
+            self.rank[item] = 0
+            self.count += 1
+
+    def find(self, item):
+        """
+        Return the root of the set holding item
+        """
+
+        # walk up to the root
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+
+        # point every item on the walk straight at the root
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+
+        return root
+
+    def union(self, a, b) -> None:
+        """
+        Merge the sets holding a and b
+        """
+        root_a, root_b = self.find(a), self.find(b)
+
+        # already in the same set
+        if root_a == root_b:
+            return
+
+        # hang the shallower tree under the deeper one
+        if self.rank[root_a] < self.rank[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        if self.rank[root_a] == self.rank[root_b]:
+            self.rank[root_a] += 1
+
+        self.count -= 1
+
 
 class UndirectedGraph:
     """
@@ -11,22 +256,44 @@ class UndirectedGraph:
     - duplicate edges not allowed
     - loops not allowed
     - no edge weights
-    - vertex names are strings
+    - vertex names are strings, stored internally as dense int ids
     """
 
     def __init__(self, start_edges=None):
         """
-        Store graph info as adjacency list
-        DO NOT CHANGE THIS METHOD IN ANY WAY
+        Store graph info as adjacency arrays of interned vertex ids
         """
-        self.adj_list = dict()
+        # readers-writer lock, set by enable_locking
+        self.lock = None
+
+        # name of each id (None once removed), id of each live name
+        self.names = []
+        self.ids = dict()
+        self.neighbors = []
+
+        # ids of removed vertices, reused by the next new vertex
+        self.free_ids = []
+
+        # connected components index, rebuilt lazily after removals
+        self.components = DisjointSet()
+        self.components_valid = True
+
+        # bumped on every change, cached results are tied to a version
+        self.version = 0
+        self.query_cache = QueryCache()
 
         # populate graph with initial vertices and edges (if provided)
-        # before using, implement add_vertex() and add_edge() methods
         if start_edges is not None:
-            for u, v in start_edges:
-                self.add_edge(u, v)
+            self.add_edges_bulk(start_edges)
 
+    @property
+    def adj_list(self):
+        """
+        Adjacency list keyed by vertex name, as a read-only view
+        """
+        return AdjacencyView(self)
+
+    @reads
     def __str__(self):
         """
         Return content of the graph in human-readable form
@@ -41,17 +308,69 @@ class UndirectedGraph:
 
     # ------------------------------------------------------------------ #
 
+    def enable_locking(self):
+        """
+        Guard every query and change with a readers-writer lock, return self
+        Call before sharing the graph between threads, then any number of
+        queries run together while each change waits for them and runs alone
+        iter_* generators are not guarded
+        """
+        if self.lock is None:
+            self.lock = RWLock()
+        return self
+
+    def enable_cache(self, maxsize=128):
+        """
+        Keep up to maxsize query results for the current version, return self
+        A maxsize of 0 turns caching off; caching is on with 128 by default
+        Each hit returns a copy of the cached list, O(V) but far cheaper than the query
+        """
+        self.query_cache.resize(maxsize)
+        return self
+
+    @classmethod
+    def from_edges(cls, edges):
+        """
+        Build a graph from an iterable of (u, v) edges
+        """
+        graph = cls()
+        graph.add_edges_bulk(edges)
+        return graph
+
+    def intern(self, v) -> int:
+        """Return the id of vertex v, giving it a new id if v is not in the graph"""
+        i = self.ids.get(v)
+        if i is None:
+            # reuse a removed vertex's id before growing the arrays
+            if self.free_ids:
+                i = self.free_ids.pop()
+                self.names[i] = v
+                self.neighbors[i] = NeighborArray(self.names)
+            else:
+                i = len(self.names)
+                self.names.append(v)
+                self.neighbors.append(NeighborArray(self.names))
+            self.ids[v] = i
+        return i
+
+    @writes
     def add_vertex(self, v: str) -> None:
         """
         Add new vertex to the graph
         """
         # help(self.add_vertex)
-        # if vertex is not a key in adj_list, add as key, initialize empty list
-        if v not in self.adj_list:
-            self.adj_list[v] = []
+        # if vertex has no id yet, intern it with no neighbors
+        if v not in self.ids:
+            i = self.intern(v)
+            self.version += 1
+
+            # new vertex is a component of its own
+            if self.components_valid:
+                self.components.add(i)
 
 
 
+    @writes
     def add_edge(self, u: str, v: str) -> None:
         """
         Add edge to the graph
@@ -64,65 +383,97 @@ class UndirectedGraph:
         # add u,v as vertices if they don't exist
         self.add_vertex(u)
         self.add_vertex(v)
+        u_id, v_id = self.ids[u], self.ids[v]
+
+
+        # insert v in u and u in v, duplicates are ignored
+        if v_id not in self.neighbors[u_id]:
+            self.neighbors[u_id].add(v_id)
+            self.neighbors[v_id].add(u_id)
+            self.version += 1
+
+        # u and v are now in the same component
+        if self.components_valid:
+            self.components.union(u_id, v_id)
+
+    @writes
+    def add_edges_bulk(self, edges) -> None:
+        """
+        Add every (u, v) edge in one pass, loops and duplicates are skipped
+        """
+        ids, neighbors, intern = self.ids, self.neighbors, self.intern
+        touched = set()
+
+        for u, v in edges:
+            # if u and v are identical, skip the edge
+            if u == v:
+                continue
 
+            # add u,v as vertices if they don't exist
+            u_id = ids[u] if u in ids else intern(u)
+            v_id = ids[v] if v in ids else intern(v)
 
-        # insert u in v
-        if len(u) == 0:
-            self.adj_list[u].append(v)
+            # insert v in u and u in v, duplicates are dropped below
+            neighbors[u_id].items.append(v_id)
+            neighbors[v_id].items.append(u_id)
+            touched.add(u_id)
+            touched.add(v_id)
 
-        #
-        else:
-            # check if v in u
-            if v not in self.adj_list[u]:
-                self.adj_list[u].append(v)
+        # one dedupe per changed row instead of a search per edge
+        for i in touched:
+            neighbors[i].dedupe()
 
-        # insert u in v
-        if len(v) == 0:
-            self.adj_list[v].append(u)
-            #
-        else:
-            # check if v in u
-            if u not in self.adj_list[v]:
-                self.adj_list[v].append(u)
+        # rebuild the components index once, on the next query
+        self.components_valid = False
+        self.version += 1
 
+    @writes
     def remove_edge(self, v: str, u: str) -> None:
         """
         Remove edge from the graph
         """
         # check if vertices exist. If not, return None
-        if u not in self.adj_list or v not in self.adj_list:
+        if u not in self.ids or v not in self.ids:
             return
 
         # if u and v are the same vertex, return None
         if u == v:
             return
 
-        # if v present in u, remove v
-        if u in self.adj_list[v]:
-            self.adj_list[v].remove(u)
+        # if v present in u, remove v and u from each other
+        u_id, v_id = self.ids[u], self.ids[v]
+        if u_id in self.neighbors[v_id]:
+            self.neighbors[v_id].discard(u_id)
+            self.neighbors[u_id].discard(v_id)
 
-        # if u present in v, remove u
-        if v in self.adj_list[u]:
-            self.adj_list[u].remove(v)
+            # a removed edge may split a component
+            self.components_valid = False
+            self.version += 1
 
 
+    @writes
     def remove_vertex(self, v: str) -> None:
         """
         Remove vertex and all connected edges
         """
         # if v doesn't exist as a vertex, return None
-        if v not in self.adj_list:
+        if v not in self.ids:
             return None
 
-        # remove all edges to/from v in graph
-        for vertex in self.adj_list:
-            if v in self.adj_list[vertex]:
-                self.remove_edge(vertex, v)
+        # remove v from each of its neighbors, edges are symmetric
+        i = self.ids.pop(v)
+        for vertex in self.neighbors[i]:
+            self.neighbors[vertex].discard(i)
 
-        # remove vertex 'v' from graph
-        self.adj_list.pop(v)
+        # remove vertex 'v' from graph, its id can be reused
+        self.names[i] = None
+        self.neighbors[i] = None
+        self.free_ids.append(i)
+        self.components_valid = False
+        self.version += 1
 
 
+    @reads
     def get_vertices(self) -> []:
         """
         Return list of vertices in the graph (any order)
@@ -131,30 +482,33 @@ class UndirectedGraph:
         # initialize empty list
         vertices = []
         # append each vertex to list
-        for i in self.adj_list:
+        for i in self.ids:
             vertices.append(i)
         # return list
         return vertices
 
-    def get_edges(self) -> []:
+    def iter_edges(self):
         """
-        Return list of edges in the graph (any order)
+        Yield every edge once as a (vertex, neighbor) pair (any order)
         """
+        names, neighbors = self.names, self.neighbors
 
-        # initialize empty list
-        edges = []
-
-        # iterate through all vertices
-        for vertex in self.adj_list:
-            # collect each vertex/edge pair
-            for edge in self.adj_list[vertex]:
-                # each each edge, skip duplicate edges
-                if (edge, vertex) not in edges:
-                    edges.append((vertex, edge))
+        # an edge is yielded from whichever end is reached first
+        done = bytearray(len(names))
+        for vertex, i in self.ids.items():
+            for edge in neighbors[i]:
+                if not done[edge]:
+                    yield vertex, names[edge]
+            done[i] = True
 
-        # return list
-        return edges
+    @reads
+    def get_edges(self) -> []:
+        """
+        Return list of edges in the graph (any order)
+        """
+        return list(self.iter_edges())
 
+    @reads
     def is_valid_path(self, path: []) -> bool:
         """
         Return true if provided path is valid, False otherwise
@@ -166,17 +520,17 @@ class UndirectedGraph:
 
         # if path has only one element, check if vertex is in graph
         if len(path) < 2:
-            if path[0] not in self.adj_list:
+            if path[0] not in self.ids:
                 return False
             return True
 
         # iterate through path
         for i in range(0,len(path)-1,1):
-            # check if vertex exists
-            if path[i] not in self.adj_list:
+            # check if both vertices exist
+            if path[i] not in self.ids or path[i+1] not in self.ids:
                 return False
             # check if edge exists
-            if path[i+1] not in self.adj_list[path[i]]:
+            if self.ids[path[i+1]] not in self.neighbors[self.ids[path[i]]]:
                 return False
 
         # if path is complete, return true
@@ -215,172 +569,432 @@ class UndirectedGraph:
         return arr
 
 
-    def dfs_traverse(self, vertex, visited, v_end):
-        """depth first traversal of list of vertices"""
-
-        # add vertex to list
-        visited.append(vertex)
-
-        # if a valid end vertex is present, check for end condition
-        if v_end is not None:
-            if vertex == v_end:
-                # if end has been reached, return
-                return
-
-        # sort vertex edges by ascending lexicographical order
-        self.shell_sort(self.adj_list[vertex])
-
-        # iterate through each edge
-        for adjacent in self.adj_list[vertex]:
-            # if an adjacent vertex has not been visited
-            if adjacent not in visited and v_end not in visited:
-                # path down adjacent vertex
-                self.dfs_traverse(adjacent, visited, v_end)
+    def iter_neighbors(self, v):
+        """
+        Yield the neighbors of a vertex in ascending lexicographical order
+        """
+        if v in self.ids:
+            names = self.names
+            for adjacent in self.neighbors[self.ids[v]].sorted():
+                yield names[adjacent]
 
-    def dfs(self, v_start, v_end=None) -> []:
+    def iter_dfs(self, v_start, v_end=None):
         """
-        Return list of vertices visited during DFS search
-        Vertices are picked in alphabetical order
+        Yield vertices in DFS order, one at a time, using an explicit stack
+        Vertices are picked in alphabetical order, stops after v_end
         """
 
         # check if starting vertex is in the graph
-        if v_start not in self.adj_list:
-            return []
+        if v_start not in self.ids:
+            return
 
         # check if end is valid
-        if v_end not in self.adj_list:
-            v_end = None
-
-        #  create empty list
-        visited = []
+        end = self.ids.get(v_end, -1)
+        names, neighbors = self.names, self.neighbors
 
-        # start recursive path from start vertex
-        self.dfs_traverse(v_start, visited, v_end)
+        # flag start as seen, one seen flag per id
+        start = self.ids[v_start]
+        seen = bytearray(len(names))
+        seen[start] = True
+        yield v_start
 
-        return visited
+        # if the start is the end, there is nothing left to visit
+        if start == end:
+            return
 
-    def bfs(self, v_start, v_end=None) -> []:
+        # each stack entry holds the remaining edges of a vertex
+        ordered = graph_stats.expand(NeighborArray.sorted)
+        stack = [iter(ordered(neighbors[start]))]
+
+        while stack:
+            # resume the deepest vertex at its next unseen adjacent
+            for adjacent in stack[-1]:
+                if not seen[adjacent]:
+                    seen[adjacent] = True
+                    yield names[adjacent]
+
+                    # if end has been reached, stop
+                    if adjacent == end:
+                        return
+
+                    # path down adjacent vertex before its siblings
+                    stack.append(iter(ordered(neighbors[adjacent])))
+                    break
+            else:
+                # all edges done, backtrack
+                stack.pop()
+
+    @reads
+    @instrumented
+    @cached_query
+    def dfs(self, v_start, v_end=None) -> []:
         """
-        Return list of vertices visited during BFS search
+        Return list of vertices visited during DFS search
         Vertices are picked in alphabetical order
         """
+        return list(self.iter_dfs(v_start, v_end))
+
+    def iter_bfs(self, v_start, v_end=None):
+        """
+        Yield vertices in BFS order, one at a time
+        Vertices are picked in alphabetical order, stops after v_end
+        """
 
         # check if starting vertex is in the graph
-        if v_start not in self.adj_list:
-            return []
+        if v_start not in self.ids:
+            return
 
         # check if end is valid
-        if v_end not in self.adj_list:
-            v_end = None
-
-        #  create empty list
-        visited = []
-
-        # initialize empty deque
-        vertex_deque = deque()
+        end = self.ids.get(v_end, -1)
+        names, neighbors = self.names, self.neighbors
 
-        # add v_start to deque
-        vertex_deque.appendleft(v_start)
+        # add v_start to deque, one seen flag per id
+        ordered = graph_stats.expand(NeighborArray.sorted)
+        start = self.ids[v_start]
+        seen = bytearray(len(names))
+        seen[start] = True
+        vertex_deque = deque([start])
 
         # if deque has vertices, pop a vertex
-        while vertex_deque != deque([]):
+        while vertex_deque:
             # take the first element out of the queue
-            vertex = vertex_deque.pop()
+            vertex = vertex_deque.popleft()
 
-            # add vertex to visited if its not a duplicate
-            if vertex not in visited:
-                visited.append(vertex)
+            # vertices are only queued once, so each pop is a new visit
+            yield names[vertex]
 
-            # check if vertex is end
-            if v_end is not None:
-                if vertex == v_end:
-                    # if end has been reached, return
-                    return visited
-
-            # sort vertex edges by ascending lexicographical order
-            self.shell_sort(self.adj_list[vertex])
+            # if end has been reached, stop
+            if vertex == end:
+                return
 
-            # iterate through each edge
-            for adjacent in self.adj_list[vertex]:
-                # if an adjacent vertex has not been visited
-                if adjacent not in visited:
+            # iterate through each edge in ascending lexicographical order
+            for adjacent in ordered(neighbors[vertex]):
+                # if an adjacent vertex has not been seen
+                if not seen[adjacent]:
                     # add vertex to queue
-                    vertex_deque.appendleft(adjacent)
+                    seen[adjacent] = True
+                    vertex_deque.append(adjacent)
+
+    @reads
+    @instrumented
+    @cached_query
+    def bfs(self, v_start, v_end=None) -> []:
+        """
+        Return list of vertices visited during BFS search
+        Vertices are picked in alphabetical order
+        """
+        return list(self.iter_bfs(v_start, v_end))
 
-        # return results
-        return visited
+    @reads
+    @instrumented
+    def bfs_levels(self, sources, max_depth=None) -> tuple:
+        """
+        Level synchronous BFS from one or more source vertices
+        Return (levels, parents) as array('i') indexed by vertex id, -1 where
+        a vertex is unreached, read them with ids[name] and names[id]
+        Sources have level 0 and parent -1, stops after max_depth levels
+        """
 
+        # accept a single source as well as an iterable of sources
+        if isinstance(sources, str):
+            sources = [sources]
+
+        levels = array('i', [-1]) * len(self.names)
+        parents = array('i', [-1]) * len(self.names)
+        seen = bytearray(len(self.names))
+
+        # the first frontier is every valid source, once
+        frontier = array('i')
+        for src in sources:
+            start = self.ids.get(src)
+            if start is not None and not seen[start]:
+                seen[start] = True
+                levels[start] = 0
+                frontier.append(start)
+
+        neighbors = self.neighbors
+        ordered = graph_stats.expand(NeighborArray.sorted)
+        depth = 0
+        while frontier and (max_depth is None or depth < max_depth):
+            depth += 1
+
+            # expand the whole frontier, in order, into the next level
+            next_frontier = array('i')
+            for vertex in frontier:
+                for adjacent in ordered(neighbors[vertex]):
+                    if not seen[adjacent]:
+                        seen[adjacent] = True
+                        levels[adjacent] = depth
+                        parents[adjacent] = vertex
+                        next_frontier.append(adjacent)
+            frontier = next_frontier
+
+        return levels, parents
+
+
+    @reads
+    @instrumented
+    def bidirectional_bfs(self, v_start, v_end) -> []:
+        """
+        Return a path from v_start to v_end with the fewest edges, searching
+        from both ends at once until the two searches meet
+        Return an empty list if v_end can't be reached
+        """
 
+        # check if both vertices are in the graph
+        if v_start not in self.ids or v_end not in self.ids:
+            return []
+        if v_start == v_end:
+            return [v_start]
+
+        # each side maps the ids it reached to the id it came from
+        start, end = self.ids[v_start], self.ids[v_end]
+        sides = ({start: None}, {end: None})
+        frontiers = ([start], [end])
+        neighbors = graph_stats.expand(self.neighbors.__getitem__)
+
+        while frontiers[0] and frontiers[1]:
+            # grow the smaller frontier by one whole level
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            own, other = sides[side], sides[1 - side]
+            next_frontier = []
+            for vertex in frontiers[side]:
+                for adjacent in neighbors(vertex):
+                    if adjacent in own:
+                        continue
+                    own[adjacent] = vertex
+
+                    # the other search already reached this vertex
+                    if adjacent in other:
+                        return self.join_paths(sides, adjacent)
+                    next_frontier.append(adjacent)
+            frontiers = (next_frontier, frontiers[1]) if side == 0 \
+                else (frontiers[0], next_frontier)
+
+        return []
+
+    def join_paths(self, sides, meet) -> []:
+        """Helper for bidirectional_bfs, join both searches at the meeting vertex"""
+
+        # walk back to the start, then forward to the end
+        path = []
+        vertex = meet
+        while vertex is not None:
+            path.append(vertex)
+            vertex = sides[0][vertex]
+        path.reverse()
+        vertex = sides[1][meet]
+        while vertex is not None:
+            path.append(vertex)
+            vertex = sides[1][vertex]
+        return [self.names[vertex] for vertex in path]
+
+    def rebuild_components(self) -> None:
+        """Rebuild the connected components index from every vertex and edge"""
+
+        # start with every vertex as its own component
+        components = DisjointSet()
+        for vertex in self.ids.values():
+            components.add(vertex)
+
+        # merge the two ends of every edge
+        neighbors = graph_stats.expand(self.neighbors.__getitem__)
+        for vertex in self.ids.values():
+            for adjacent in neighbors(vertex):
+                components.union(vertex, adjacent)
+
+        # publish the finished index, readers may be using the old one
+        self.components = components
+        self.components_valid = True
+
+    @reads
+    @instrumented
+    @cached_query
     def count_connected_components(self):
         """
         Return number of connected componets in the graph
         """
 
-        # initialize empty count list and visited dictionary
-        count = []
-        visited = {}
+        # rebuild the index only if an edge or vertex was removed
+        if not self.components_valid:
+            self.rebuild_components()
+
+        return self.components.count
 
-        # set all vertices in visited to False
-        for vertex in self.adj_list:
-            visited[vertex] = False
+    @reads
+    def same_component(self, u: str, v: str) -> bool:
+        """
+        Return True if u and v are connected by some path, False otherwise
+        """
 
-        for vertex in self.adj_list:
-            # visit each vertex
-            if visited[vertex] == False:
-                # append dfs for a vertex
-                count.append(self.dfs(vertex))
-                for visit in visited:
-                    for element in count:
-                        if visit in element:
-                            visited[visit] = True
+        # vertices outside the graph are not connected to anything
+        if u not in self.ids or v not in self.ids:
+            return False
 
+        # rebuild the index only if an edge or vertex was removed
+        if not self.components_valid:
+            self.rebuild_components()
 
-        return len(count)
+        return self.components.find(self.ids[u]) == self.components.find(self.ids[v])
 
     def cycle_traverse(self, vertex, visited, parent):
-        """Helper traversal method for has_cycle"""
+        """Helper traversal method for has_cycle, using an explicit stack"""
 
-        # add vertex to list
+        # flag vertex as visited
         visited[vertex] = True
 
-        # sort vertex edges by ascending lexicographical order
-        self.shell_sort(self.adj_list[vertex])
+        # each stack entry holds a vertex, its parent and its remaining edges
+        neighbors = graph_stats.expand(self.neighbors.__getitem__)
+        stack = [(vertex, parent, iter(neighbors(vertex)))]
 
-        # iterate through each edge
-        for adjacent in self.adj_list[vertex]:
+        while stack:
+            current, parent, adjacents = stack[-1]
 
-            # if an adjacent vertex has not been visited
-            if visited[adjacent] == False:
-                if self.cycle_traverse(adjacent, visited,vertex) == True:
-                    return True
+            # iterate through each remaining edge
+            for adjacent in adjacents:
 
-            # if visited = True and adjacent isn't the direct parent, return True
-            elif visited[adjacent] == True and adjacent != parent:
-                return True
+                # if an adjacent vertex has not been visited, descend
+                if not visited[adjacent]:
+                    visited[adjacent] = True
+                    stack.append((adjacent, current, iter(neighbors(adjacent))))
+                    break
+
+                # if visited = True and adjacent isn't the direct parent, return True
+                elif adjacent != parent:
+                    return True
+            else:
+                # all edges done, backtrack
+                stack.pop()
 
         return False
 
+    @reads
+    @instrumented
+    @cached_query
     def has_cycle(self):
         """
         Return True if graph contains a cycle, False otherwise
         """
 
-        # initialize empty dictionary
-        visited = {}
-
-        # populate each vertex with false in visited dictionary
-        for vertex in self.adj_list:
-            visited[vertex] = False
+        # one visited flag per id
+        visited = bytearray(len(self.names))
 
         # visit each vertex
-        for vertex in self.adj_list:
-            if visited[vertex] == False:
-                # make recursive call
-                if(self.cycle_traverse(vertex, visited, None)) == True:
+        for vertex in self.ids.values():
+            if not visited[vertex]:
+                # walk the vertex's component
+                if self.cycle_traverse(vertex, visited, -1):
                     return True
 
         return False
 
+    # ------------------------------------------------------------------ #
+
+    # snapshot header: magic, vertex count, neighbor entries, name bytes
+    SNAPSHOT_MAGIC = b'UGS1'
+    SNAPSHOT_HEADER = struct.Struct('<4s4xqqq')
+
+    @staticmethod
+    def read_edge_list(path, delimiter=','):
+        """
+        Yield (u, v) edges from a delimited text file one at a time
+        Blank and # lines are skipped
+        """
+        with open(path, newline='') as file:
+            for row in csv.reader(file, delimiter=delimiter):
+                # skip blank lines and comments
+                if not row or row[0].startswith('#'):
+                    continue
+                yield row[0], row[1]
+
+    @classmethod
+    def load_edge_list(cls, path, delimiter=','):
+        """
+        Build a graph from a delimited text file without reading it into memory
+        """
+        return cls.from_edges(cls.read_edge_list(path, delimiter))
+
+    @reads
+    def write_edge_list(self, path, delimiter=',') -> None:
+        """
+        Write every edge once as a u, v line
+        """
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file, delimiter=delimiter)
+            writer.writerows(self.iter_edges())
+
+    @reads
+    def save_snapshot(self, path) -> None:
+        """
+        Save the graph as a binary CSR snapshot in native byte order
+        Layout: header, name offsets (q), names (utf-8), offsets (q), targets (i)
+        """
+
+        # number the vertices in insertion order, ids may have gaps
+        index = {i: n for n, i in enumerate(self.ids.values())}
+
+        # pack every name into one utf-8 blob with offsets
+        names = bytearray()
+        name_offsets = array('q', [0])
+        for vertex in self.ids:
+            names += vertex.encode()
+            name_offsets.append(len(names))
+
+        # flatten the neighbor arrays into offsets and targets arrays
+        offsets = array('q', [0])
+        targets = array('i')
+        for i in self.ids.values():
+            targets.extend(index[adjacent] for adjacent in self.neighbors[i])
+            offsets.append(len(targets))
+
+        with open(path, 'wb') as file:
+            file.write(self.SNAPSHOT_HEADER.pack(
+                self.SNAPSHOT_MAGIC, len(index), len(targets), len(names)))
+            name_offsets.tofile(file)
+            file.write(names)
+            offsets.tofile(file)
+            targets.tofile(file)
+
+    @classmethod
+    def load_snapshot(cls, path):
+        """
+        Load a graph saved with save_snapshot, reading the file through mmap
+        """
+        header = cls.SNAPSHOT_HEADER
+
+        with open(path, 'rb') as file, \
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            magic, v_count, e_count, name_bytes = header.unpack_from(buffer)
+            if magic != cls.SNAPSHOT_MAGIC:
+                raise ValueError(f'{path} is not an UndirectedGraph snapshot')
+
+            # copy each section straight out of the mapped pages
+            start = header.size
+            name_offsets = array('q', buffer[start:start + (v_count + 1) * 8])
+            start += (v_count + 1) * 8
+            names = buffer[start:start + name_bytes]
+            start += name_bytes
+            offsets = array('q', buffer[start:start + (v_count + 1) * 8])
+            start += (v_count + 1) * 8
+            targets = array('i', buffer[start:start + e_count * 4])
+
+        # snapshot numbering becomes the ids, each row is already an id array
+        graph = cls()
+        graph.names.extend(names[name_offsets[i]:name_offsets[i + 1]].decode()
+                           for i in range(v_count))
+        graph.ids = {vertex: i for i, vertex in enumerate(graph.names)}
+        for i in range(v_count):
+            neighbors = NeighborArray(graph.names)
+            neighbors.items = targets[offsets[i]:offsets[i + 1]]
+
+            # rows are already unique, this only builds the id index
+            neighbors.dedupe()
+            graph.neighbors.append(neighbors)
+
+        # rebuild the components index once, on the next query
+        graph.components_valid = False
+        return graph
+
 
 
 
@@ -475,3 +1089,14 @@ if __name__ == '__main__':
         u, v = edge
         g.add_edge(u, v) if command == 'add' else g.remove_edge(u, v)
         print('{:<10}'.format(case), g.has_cycle())
+
+
+    print("\nmethod bfs_levels() example 1")
+    print("-----------------------------")
+    edges = ['AE', 'AC', 'BE', 'CE', 'CD', 'CB', 'BD', 'ED', 'BH', 'QG', 'FG']
+    g = UndirectedGraph(edges)
+    levels, parents = g.bfs_levels('A')
+    for v in sorted(g.get_vertices()):
+        i = g.ids[v]
+        parent = g.names[parents[i]] if parents[i] >= 0 else None
+        print(f'{v} LEVEL:{levels[i]} PARENT:{parent}')